@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the E2EE test scripts
+(test-bidirectional.py, test-kick-member.py, test-e2ee.py,
+test-three-members.py, test-three-members-kick.py, mls_multi.py)
+"""
+
+import argparse
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Command acknowledgements printed by the CLI, used to return from a command
+# as soon as it has completed instead of sleeping for the full wait. Most are
+# recognised by line prefix (see _ACK_PREFIXES) and named by a string; the
+# rest are regexes searched in the output.
+ACK_SPACE_CREATED = 'space_created'
+ACK_CONTEXT = 'context'
+ACK_INVITE = 'invite'
+ACK_NETWORK = 'network'
+ACK_CONNECTED = 'connected'
+ACK_JOINED = 'joined'
+ACK_WHOAMI = 'whoami'
+ACK_MEMBER_ADDED = re.compile(rb'added to MLS group!|Failed to add member')
+# Not a prefix: "Published Commit to existing members" must not count
+ACK_PUBLISHED = re.compile(rb'Published \d+ KeyPackages|Failed to publish KeyPackages')
+ACK_MLS_JOINED = 'mls_joined'
+ACK_COMMIT = 'commit'
+ACK_CHANNEL_CREATED = 'channel_created'
+ACK_THREAD_CREATED = 'thread_created'
+ACK_SENT = 'sent'
+ACK_SPACE_LIST = 'space_list'
+ACK_SPACE_SWITCHED = 'space_switched'
+ACK_CHANNEL_SWITCHED = 'channel_switched'
+ACK_THREAD_SWITCHED = 'thread_switched'
+ACK_REMOVED = 'removed'
+
+# Line prefixes for the named acknowledgements, matched after indentation and
+# the leading ✓/✗/ℹ status marker are stripped
+_ACK_PREFIXES = {
+    b'Created space: ': ACK_SPACE_CREATED,
+    b'Thread: ': ACK_CONTEXT,
+    b'Created invite': ACK_INVITE,
+    b'Peer ID: ': ACK_NETWORK,
+    b'Connected to peer!': ACK_CONNECTED,
+    b'Successfully joined Space!': ACK_JOINED,
+    b'User ID: ': ACK_WHOAMI,
+    b'Successfully joined MLS group': ACK_MLS_JOINED,
+    b'Processed Commit': ACK_COMMIT,
+    b'Created channel: ': ACK_CHANNEL_CREATED,
+    b'Created thread: ': ACK_THREAD_CREATED,
+    b'Message sent (': ACK_SENT,
+    b'Spaces (': ACK_SPACE_LIST,
+    b'No spaces yet': ACK_SPACE_LIST,
+    b'Switched to space: ': ACK_SPACE_SWITCHED,
+    b'Switched to channel: ': ACK_CHANNEL_SWITCHED,
+    b'Switched to thread: ': ACK_THREAD_SWITCHED,
+    b'Successfully removed user': ACK_REMOVED,
+    b'Failed to remove member': ACK_REMOVED
+}
+_ACK_PREFIX_LENGTHS = sorted({len(prefix) for prefix in _ACK_PREFIXES})
+_STATUS_MARKERS = ('✓ '.encode(), '✗ '.encode(), 'ℹ '.encode())
+
+# Listen address announced for a client's own port, filled in with the port
+_READY_PATTERN = rb'Listening on /ip4/[0-9.]+/tcp/%d\b'
+
+# Output patterns, compiled once; group 1 is the value find_in_log returns
+PATTERNS = {
+    'space_short': re.compile(rb'Created space: .+? \(([0-9a-f]{16})\)'),
+    'channel_created': re.compile(rb'Created channel: .+? \(([0-9a-f]{16})\)'),
+    'thread_created': re.compile(rb'Created thread: .+? \(([0-9a-f]{16})\)'),
+    'space_full': re.compile(rb'Space: ([0-9a-f]{64})'),
+    'invite': re.compile(rb'Created invite code: (\w+)'),
+    'user_id': re.compile(rb'User ID: ([0-9a-f]{64})'),
+    'peer_id': re.compile(rb'Peer ID: (\w+)'),
+    'channel_id': re.compile(rb'([0-9a-f]{16})\s+-\s+general')
+}
+
+_scratch_root = None
+
+def scratch_dir():
+    """Return this run's scratch directory, created on first use and removed at exit
+
+    It lives on tmpfs (/dev/shm) where available, so the clients' MLS state
+    writes never reach the disk.
+    """
+    global _scratch_root
+    if _scratch_root is None:
+        parent = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        _scratch_root = tempfile.mkdtemp(prefix='spaceway-test-', dir=parent)
+        atexit.register(shutil.rmtree, _scratch_root, ignore_errors=True)
+    return _scratch_root
+
+class Color:
+    RED = '\033[0;31m'
+    GREEN = '\033[0;32m'
+    YELLOW = '\033[1;33m'
+    BLUE = '\033[0;34m'
+    CYAN = '\033[0;36m'
+    NC = '\033[0m'
+
+def ok(message):
+    """Format a passed check for the results report"""
+    return f"{Color.GREEN}✓{Color.NC} {message}"
+
+def fail(message):
+    """Format a failed check for the results report"""
+    return f"{Color.RED}✗{Color.NC} {message}"
+
+def compile_checks(checks):
+    """Merge (name, pattern) result checks into one named-group alternation"""
+    return re.compile(b'|'.join(b'(?P<%s>%s)' % (name.encode(), pattern) for name, pattern in checks))
+
+class LogTail:
+    """A client's output kept in memory as it arrives, so lookups never re-read the log
+
+    `complete` is the end of the last complete line; lookups and tallies only
+    look at complete lines and remember how far they have already searched.
+    """
+
+    __slots__ = ('buf', 'complete', 'found', 'searched', 'counts', 'scanned_offset')
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.complete = 0
+        self.found = {}
+        self.searched = {}
+        self.counts = Counter()
+        self.scanned_offset = 0
+
+    def append(self, data):
+        """Buffer a chunk of output and return the lines it completed"""
+        self.buf += data
+        end = self.buf.rfind(b'\n') + 1
+        if end <= self.complete:
+            return []
+        lines = bytes(self.buf[self.complete:end]).splitlines()
+        self.complete = end
+        return lines
+
+    def find(self, key, pattern):
+        """Return group 1 of the first `pattern` match, searching only lines new to `key`"""
+        if key not in self.found:
+            match = pattern.search(self.buf, self.searched.get(key, 0), self.complete)
+            if not match:
+                self.searched[key] = self.complete
+                return None
+            self.found[key] = match.group(1).decode()
+        return self.found[key]
+
+    def tally(self, result_re):
+        """Add result_re matches from newly completed lines to the running counts"""
+        self.counts.update(match.lastgroup for match in result_re.finditer(self.buf, self.scanned_offset, self.complete))
+        self.scanned_offset = self.complete
+        return self.counts
+
+class SpacewayClient:
+    """A spaceway CLI process driven over stdin, with its output teed to a log file
+
+    The client's data directory defaults to `<account stem>-data` under
+    scratch_dir() rather than the working directory.
+    """
+
+    __slots__ = (
+        'name', 'account', 'port', 'data_dir', 'log_file', 'binary_path', 'process', 'log_handle',
+        'output', 'tail_offset', 'new_output', 'stdin_fd', 'stdout_fd', 'output_closed',
+        'acks', 'user_id', 'peer_id'
+    )
+
+    def __init__(self, name, account, port, log_file, binary_path='./target/debug/spaceway', data_dir=None):
+        self.name = name
+        self.account = account
+        self.port = port
+        self.data_dir = data_dir or os.path.join(scratch_dir(), Path(account).stem + '-data')
+        self.log_file = log_file
+        self.binary_path = binary_path
+        self.process = None
+        self.log_handle = None
+        self.output = LogTail()
+        self.tail_offset = 0
+        self.new_output = None
+        self.stdin_fd = None
+        self.stdout_fd = None
+        self.output_closed = None
+        self.acks = {}
+        self.user_id = None
+        self.peer_id = None
+
+    async def start(self):
+        """Spawn the client; use await_ready to wait for it to come up"""
+        # Unbuffered: each pipe read (up to 64 KiB) is one write, so the log
+        # is complete on disk even if the harness dies before stop()
+        self.log_handle = open(self.log_file, 'wb', buffering=0)
+        self.new_output = asyncio.Event()
+        self.acks = {name: asyncio.Event() for name in set(_ACK_PREFIXES.values())}
+        self.output_closed = asyncio.Event()
+        # stdout goes to a plain pipe that the event loop's selector watches
+        # directly, so every client is served by the one loop thread
+        read_fd, write_fd = os.pipe()
+        try:
+            # Our fds are non-inheritable (PEP 446), so close_fds isn't needed;
+            # leaving it off lets subprocess launch the child with posix_spawn
+            self.process = await asyncio.create_subprocess_exec(
+                self.binary_path, '--account', self.account, '--port', str(self.port),
+                '--data-dir', self.data_dir,
+                stdin=asyncio.subprocess.PIPE, stdout=write_fd, stderr=asyncio.subprocess.STDOUT,
+                close_fds=False
+            )
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        self.stdout_fd = read_fd
+        asyncio.get_running_loop().add_reader(read_fd, self.on_output)
+        # Commands are written straight to the pipe fd, one syscall each
+        self.stdin_fd = self.process.stdin.get_extra_info('pipe').fileno()
+
+    async def await_ready(self, timeout=10):
+        """Wait until the client is listening on its own TCP port"""
+        self.tail_offset = 0
+        return await self.wait_for(_READY_PATTERN % self.port, timeout)
+
+    def on_output(self):
+        """Copy whatever stdout has ready to the log file and the in-memory output"""
+        try:
+            data = os.read(self.stdout_fd, 65536)
+        except BlockingIOError:
+            return
+        if not data:
+            self.close_output()
+            return
+        self.log_handle.write(data)
+        for line in self.output.append(data):
+            self.dispatch_ack(line)
+        self.new_output.set()
+
+    def close_output(self):
+        if self.stdout_fd is not None:
+            asyncio.get_running_loop().remove_reader(self.stdout_fd)
+            os.close(self.stdout_fd)
+            self.stdout_fd = None
+        self.output_closed.set()
+
+    def dispatch_ack(self, line):
+        """Set the acknowledgement event whose prefix starts this line, if any"""
+        line = line.lstrip(b' ')
+        for marker in _STATUS_MARKERS:
+            if line.startswith(marker):
+                line = line[len(marker):]
+                break
+        for length in _ACK_PREFIX_LENGTHS:
+            name = _ACK_PREFIXES.get(line[:length])
+            if name:
+                self.acks[name].set()
+                return
+
+    async def send_command(self, command, wait=2, wait_for=None):
+        """Send a command to the client
+
+        Without wait_for this sleeps for `wait` seconds. With a wait_for pattern
+        it returns as soon as the pattern shows up in the client's new output,
+        using `wait` only as an upper bound.
+        """
+        return await self.send_batch([command], wait, wait_for)
+
+    async def send_batch(self, commands, wait=2, wait_for=None):
+        """Send several commands in one write and wait as send_command does
+
+        The CLI runs piped input one line at a time, so commands that don't
+        need each other's output can be queued together; wait_for should be
+        the last command's acknowledgement.
+        """
+        for command in commands:
+            print(f"{Color.CYAN}[{self.name}]{Color.NC} {command}")
+        # Only output produced after these commands counts towards the acknowledgement
+        self.tail_offset = len(self.output.buf)
+        if isinstance(wait_for, str):
+            self.acks[wait_for].clear()
+        os.write(self.stdin_fd, ''.join(command + '\n' for command in commands).encode('ascii'))
+        if wait_for is None:
+            await asyncio.sleep(wait)
+            return None
+        return await self.wait_for(wait_for, wait)
+
+    def expect_ack(self, *names):
+        """Clear these acknowledgements before another client sends what triggers them
+
+        send_batch only clears the sender's own acknowledgement; without this
+        a wait_for on the receiver could return on one left over from an
+        earlier step.
+        """
+        for name in names:
+            self.acks[name].clear()
+
+    async def wait_for(self, pattern, timeout):
+        """Wait until pattern appears in the output past the tail offset
+
+        A named acknowledgement (one of the string ACK_* values) waits on its
+        prefix event instead of searching the output; when the command that
+        triggers it goes to another client, call expect_ack first.
+        """
+        if isinstance(pattern, str):
+            try:
+                return await asyncio.wait_for(self.acks[pattern].wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        regex = re.compile(pattern)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            match = regex.search(self.output.buf, self.tail_offset)
+            if match:
+                self.tail_offset = match.end()
+                return match
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            self.new_output.clear()
+            try:
+                await asyncio.wait_for(self.new_output.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        """Terminate the client and flush the rest of its output to the log"""
+        if self.process:
+            if self.process.returncode is None:
+                self.process.terminate()
+                try:
+                    await asyncio.wait_for(self.process.wait(), 5)
+                except asyncio.TimeoutError:
+                    self.process.kill()
+                    await self.process.wait()
+            # Drain what is left in the pipe before closing it
+            try:
+                await asyncio.wait_for(self.output_closed.wait(), 2)
+            except asyncio.TimeoutError:
+                self.close_output()
+        if self.log_handle:
+            self.log_handle.close()
+
+    async def identify(self, peer_id=False):
+        """Look up the client's full user ID (and optionally its peer ID) once
+
+        Both are fixed for the life of the process, so they are cached on the
+        client and later calls send nothing.
+        """
+        if self.user_id is None:
+            await self.send_command('whoami', wait=2, wait_for=ACK_WHOAMI)
+            self.user_id = self.find_in_log('user_id')
+        if peer_id and self.peer_id is None:
+            await self.send_command('network', wait=2, wait_for=ACK_NETWORK)
+            self.peer_id = self.find_in_log('peer_id')
+
+    def find_in_log(self, key, pattern=None):
+        """Return group 1 of the first PATTERNS[key] (or `pattern`) match in the output
+
+        Each key only searches the complete lines that arrived since its last
+        lookup, and a value is remembered once found.
+        """
+        return self.output.find(key, pattern or PATTERNS[key])
+
+    def check_log(self, key, pattern=None):
+        """Check if the PATTERNS[key] (or `pattern`) pattern exists in the output"""
+        return self.find_in_log(key, pattern) is not None
+
+    def tally_output(self, result_re):
+        """Add result_re matches from newly completed lines to the running counts"""
+        return self.output.tally(result_re)
+
+    async def wait_for_counts(self, result_re, minimums, timeout):
+        """Wait until the running result_re counts reach every value in `minimums`
+
+        A key may be a tuple of check names, whose counts are summed. Returns
+        True as soon as all minimums are met, or False once `timeout` passes
+        without that happening.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            counts = self.tally_output(result_re)
+            if all(_count(counts, name) >= minimum for name, minimum in minimums.items()):
+                return True
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            self.new_output.clear()
+            try:
+                await asyncio.wait_for(self.new_output.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+def _count(counts, name):
+    """One check's count, or the sum over a tuple of check names"""
+    if isinstance(name, tuple):
+        return sum(counts[part] for part in name)
+    return counts[name]
+
+async def start_all(clients):
+    """Start every client and wait until all of them are listening"""
+    await asyncio.gather(*(client.start() for client in clients))
+    await asyncio.gather(*(client.await_ready() for client in clients))
+
+async def publish_keypackages(clients):
+    """Publish every client's KeyPackages side by side
+
+    The KeyPackages go to the DHT held by the running peers, so this has to
+    happen on every run; it can't be restored from a saved data directory.
+    """
+    await asyncio.gather(*(
+        client.send_command('keypackage publish', wait=5, wait_for=ACK_PUBLISHED) for client in clients
+    ))
+
+def parse_harness_args(description, scenarios=None):
+    """Parse the options that let several harness runs share one host
+
+    --port-base sets the first client's port (the rest follow it) and
+    --data-prefix is prepended to account, history and log file names.
+    When `scenarios` is given, one or more of them are taken positionally.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    if scenarios:
+        parser.add_argument('scenarios', nargs='+', choices=scenarios, help='scenarios to run, in order')
+    parser.add_argument('--port-base', type=int, default=9001, help='port of the first client (default: 9001)')
+    parser.add_argument('--data-prefix', default='', help='prefix for account, history and log files')
+    return parser.parse_args()
+
+def cleanup(prefixes, data_prefix=''):
+    """Remove account data, keys, histories and the given tests' logs
+
+    One directory pass collects the targets, which are then removed from a
+    small thread pool so the data directory trees are walked in parallel.
+    Only data, key and history files starting with `data_prefix` are
+    touched, so runs with different prefixes don't remove each other's.
+    """
+    logs = {prefix + '.log' for prefix in prefixes}
+    targets = []
+    for entry in os.scandir('.'):
+        name = entry.name
+        if not name.startswith(data_prefix) and name not in logs:
+            continue
+        if name.endswith(('-data', '.key', '.history')) or name in logs:
+            targets.append(entry)
+    if not targets:
+        return
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(_remove, targets))
+
+def _remove(entry):
+    try:
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            os.unlink(entry.path)
+    except OSError:
+        pass
+
+# Per-profile fingerprint of the sources the last successful build used
+BUILD_CACHE = Path('.spaceway_test_build_cache.json')
+
+def _workspace_members():
+    """The crate directories listed in the workspace manifest"""
+    try:
+        import tomllib
+        with open('Cargo.toml', 'rb') as f:
+            return tomllib.load(f)['workspace']['members']
+    except (ImportError, OSError, ValueError, KeyError):
+        # No tomllib before Python 3.11; these are the crates the CLI builds from
+        return ['core', 'cli']
+
+def _source_fingerprint():
+    """Hash the path, size and mtime of every workspace crate's sources and manifests
+
+    Covers the workspace manifest, lockfile and toolchain file too, so a
+    dependency bump or a change in any member invalidates the cached build.
+    Only the files are stat'ed, not read, so an unchanged tree costs one
+    stat per source file.
+    """
+    sources = [Path('Cargo.toml'), Path('Cargo.lock'), Path('rust-toolchain.toml')]
+    for crate in _workspace_members():
+        sources.extend(Path(crate, name) for name in ('Cargo.toml', 'build.rs', 'rust-toolchain.toml'))
+        sources.extend(sorted(Path(crate, 'src').rglob('*.rs')))
+    digest = hashlib.blake2b()
+    for path in sources:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        digest.update(f'{path}:{st.st_size}:{st.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()
+
+def build_once(profile='debug'):
+    """Build the CLI for `profile` unless its sources are unchanged since the last build
+
+    Fingerprints for both profiles are kept in BUILD_CACHE, so scripts using
+    the debug and release binaries don't invalidate each other. Returns the
+    binary path, or None if the build failed.
+    """
+    binary_path = f'./target/{profile}/spaceway'
+    fingerprint = _source_fingerprint()
+    try:
+        cache = json.loads(BUILD_CACHE.read_text())
+    except (OSError, ValueError):
+        cache = {}
+
+    if cache.get(profile) == fingerprint and os.path.exists(binary_path):
+        print(f"{Color.GREEN}✓ Using existing {profile} binary{Color.NC}")
+        return binary_path
+
+    print(f"{Color.CYAN}Building {profile} version (this may take a while)...{Color.NC}")
+    cmd = ['cargo', '+nightly', 'build'] + (['--release'] if profile == 'release' else [])
+    # Stream cargo's stderr through a bounded buffer rather than holding all of it
+    build = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    tail = deque(maxlen=500)
+    for line in build.stderr:
+        tail.append(line)
+    if build.wait() != 0:
+        print(f"{Color.RED}Build failed!{Color.NC}")
+        print(''.join(tail)[-500:])
+        return None
+
+    cache[profile] = fingerprint
+    BUILD_CACHE.write_text(json.dumps(cache, indent=2))
+    print(f"{Color.GREEN}✓ Build completed{Color.NC}")
+    return binary_path
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Three-member MLS group scenarios, shared by test-three-members.py and
+test-three-members-kick.py
+
+  basic: Alice creates space → invites Bob and Charlie → Alice posts message →
+         Both Bob and Charlie can decrypt it
+  kick:  ... → all exchange messages → Alice kicks Bob → Alice sends message →
+         Bob CANNOT decrypt, Charlie CAN decrypt
+
+Run one or more scenarios in a single interpreter with
+`python mls_multi.py basic kick`.
+"""
+
+import asyncio
+import os
+import sys
+
+from _testutil import (
+    ACK_CHANNEL_CREATED, ACK_COMMIT, ACK_CONNECTED, ACK_CONTEXT, ACK_INVITE, ACK_JOINED,
+    ACK_MEMBER_ADDED, ACK_MLS_JOINED, ACK_REMOVED, ACK_SENT, ACK_SPACE_CREATED,
+    ACK_THREAD_CREATED, ACK_THREAD_SWITCHED,
+    Color, SpacewayClient, build_once, cleanup, compile_checks, fail, ok,
+    parse_harness_args, publish_keypackages, scratch_dir, start_all
+)
+
+# Result checks, merged into one alternation so each log is scanned once
+BASIC_RESULT_RE = compile_checks([
+    ('decrypt', rb'Decrypted (?:Space MLS|Channel MLS|queued) message'),
+    ('greeting', rb'Can Bob and Charlie both decrypt this')
+])
+
+KICK_RESULT_RE = compile_checks([
+    ('decrypt', rb'Decrypted (?:Space MLS|Channel MLS|queued) message'),
+    ('msg1', rb'Before kick'),
+    ('msg2', rb'Bob reply before kick'),
+    ('msg3', rb'Charlie reply before kick'),
+    ('msg4', rb'After kick'),
+    ('removed', rb'Successfully removed user'),
+    ('rotated', rb'MLS keys rotated'),
+    ('no_decrypt', rb"(?i:removed member can't decrypt)"),
+    # Bob's copy of a post-kick message that he couldn't read; one he did read counts as 'decrypt'
+    ('rejected', rb'Failed to decrypt MLS message|Message from future epoch')
+])
+
+async def exchange_basic(alice, bob, charlie, space_id):
+    """Alice posts one message that both Bob and Charlie should decrypt"""
+    await alice.send_command('send Hello everyone! Can Bob and Charlie both decrypt this?', wait=4, wait_for=ACK_SENT)
+
+    # Wait for message propagation
+    print(f"{Color.YELLOW}⏳ Waiting for message propagation (up to 10s)...{Color.NC}")
+    await asyncio.gather(
+        bob.wait_for_counts(BASIC_RESULT_RE, {'greeting': 1}, 10),
+        charlie.wait_for_counts(BASIC_RESULT_RE, {'greeting': 1}, 10)
+    )
+
+def report_basic(alice_counts, bob_counts, charlie_counts, lines):
+    """Append the basic scenario's checks to `lines` and return how many passed"""
+    # Count decryptions
+    alice_decrypts = alice_counts['decrypt']
+    bob_decrypts = bob_counts['decrypt']
+    charlie_decrypts = charlie_counts['decrypt']
+
+    # Check if they received Alice's message
+    bob_got_message = bob_counts['greeting'] > 0
+    charlie_got_message = charlie_counts['greeting'] > 0
+
+    lines.append(f"  Alice total decryptions: {alice_decrypts}")
+    lines.append(f"  Bob total decryptions: {bob_decrypts}")
+    lines.append(f"  Charlie total decryptions: {charlie_decrypts}")
+    lines.append(f"  Bob received Alice's message: {bob_got_message}")
+    lines.append(f"  Charlie received Alice's message: {charlie_got_message}\n")
+
+    tests_passed = 0
+
+    # Test 1: Bob received MLS messages
+    if bob_decrypts >= 3:  # CreateChannel, CreateThread, Message
+        lines.append(ok(f"Bob decrypted MLS messages ({bob_decrypts} total)"))
+        tests_passed += 1
+    else:
+        lines.append(fail(f"Bob should have ≥3 decryptions, got {bob_decrypts}"))
+
+    # Test 2: Charlie received MLS messages
+    if charlie_decrypts >= 3:  # CreateChannel, CreateThread, Message
+        lines.append(ok(f"Charlie decrypted MLS messages ({charlie_decrypts} total)"))
+        tests_passed += 1
+    else:
+        lines.append(fail(f"Charlie should have ≥3 decryptions, got {charlie_decrypts}"))
+
+    # Test 3: Bob got Alice's message content
+    if bob_got_message:
+        lines.append(ok("Bob decrypted Alice's message content"))
+        tests_passed += 1
+    else:
+        lines.append(fail("Bob didn't receive Alice's message"))
+
+    # Test 4: Charlie got Alice's message content
+    if charlie_got_message:
+        lines.append(ok("Charlie decrypted Alice's message content"))
+        tests_passed += 1
+    else:
+        lines.append(fail("Charlie didn't receive Alice's message"))
+
+    # Test 5: Both Bob and Charlie are in the same MLS group
+    if bob_got_message and charlie_got_message:
+        lines.append(ok("Three-way MLS group communication working!"))
+        tests_passed += 1
+    else:
+        lines.append(fail("Not all members received the message"))
+
+    return tests_passed
+
+async def exchange_kick(alice, bob, charlie, space_id):
+    """All three exchange messages, then Alice kicks Bob and posts once more"""
+    await alice.send_command('send Message 1: Before kick', wait=4, wait_for=ACK_SENT)
+
+    # Wait for GossipSub propagation
+    print(f"{Color.YELLOW}⏳ Waiting for message propagation (up to 5s)...{Color.NC}")
+    await asyncio.gather(
+        bob.wait_for_counts(KICK_RESULT_RE, {'msg1': 1}, 5),
+        charlie.wait_for_counts(KICK_RESULT_RE, {'msg1': 1}, 5)
+    )
+
+    # Bob and Charlie navigate to the thread. The IDs come from Alice's
+    # output, so no listing is needed and the hops go in one write each
+    print(f"\n{Color.CYAN}Bob and Charlie navigating to thread...{Color.NC}")
+    channel_id = alice.find_in_log('channel_created')
+    thread_id = alice.find_in_log('thread_created')
+    navigation = [f'space {space_id}', f'channel {channel_id}', f'thread {thread_id}']
+    await asyncio.gather(
+        bob.send_batch(navigation, wait=6, wait_for=ACK_THREAD_SWITCHED),
+        charlie.send_batch(navigation, wait=6, wait_for=ACK_THREAD_SWITCHED)
+    )
+
+    # Bob and Charlie reply
+    print(f"\n{Color.CYAN}Bob and Charlie replying...{Color.NC}")
+    await asyncio.gather(
+        bob.send_command('send Message 2: Bob reply before kick', wait=4, wait_for=ACK_SENT),
+        charlie.send_command('send Message 3: Charlie reply before kick', wait=4, wait_for=ACK_SENT)
+    )
+
+    # Wait for both replies
+    print(f"{Color.YELLOW}⏳ Waiting for replies (up to 7s)...{Color.NC}")
+    await asyncio.gather(
+        alice.wait_for_counts(KICK_RESULT_RE, {'msg2': 1, 'msg3': 1}, 7),
+        charlie.wait_for_counts(KICK_RESULT_RE, {'msg2': 1}, 7)
+    )
+
+    # === KICK BOB ===
+    print(f"\n{Color.CYAN}{'='*50}{Color.NC}")
+    print(f"{Color.CYAN}Alice kicking Bob from the space...{Color.NC}")
+    print(f"{Color.CYAN}{'='*50}{Color.NC}\n")
+    await alice.send_command(f'kick {bob.user_id}', wait=7, wait_for=ACK_REMOVED)
+
+    print(f"{Color.GREEN}✓ Bob has been kicked{Color.NC}\n")
+
+    # Alice sends message AFTER kick
+    print(f"{Color.CYAN}Alice sending message after kicking Bob...{Color.NC}")
+    bob_counts = bob.tally_output(KICK_RESULT_RE)
+    bob_reactions = bob_counts['decrypt'] + bob_counts['rejected']
+    await alice.send_command('send Message 4: After kick - Bob should NOT see, Charlie SHOULD see', wait=4, wait_for=ACK_SENT)
+
+    # Final wait for message propagation: done once Charlie has message 4 and
+    # Bob has reacted (decrypted or rejected) to it, so the check that Bob
+    # can't read it doesn't run before his copy has even arrived
+    print(f"{Color.YELLOW}⏳ Final propagation wait (up to 10s)...{Color.NC}")
+    await asyncio.gather(
+        charlie.wait_for_counts(KICK_RESULT_RE, {'msg4': 1}, 10),
+        bob.wait_for_counts(KICK_RESULT_RE, {('decrypt', 'rejected'): bob_reactions + 1}, 10)
+    )
+
+def report_kick(alice_counts, bob_counts, charlie_counts, lines):
+    """Append the kick scenario's checks to `lines` and return how many passed"""
+    # Count decryptions
+    alice_decrypts = alice_counts['decrypt']
+    bob_decrypts = bob_counts['decrypt']
+    charlie_decrypts = charlie_counts['decrypt']
+
+    # Check specific messages
+    bob_got_msg1 = bob_counts['msg1'] > 0
+    alice_got_msg2 = alice_counts['msg2'] > 0
+    alice_got_msg3 = alice_counts['msg3'] > 0
+    charlie_got_msg3 = charlie_counts['msg2'] > 0
+    bob_got_msg4 = bob_counts['msg4'] > 0  # Should be FALSE
+    charlie_got_msg4 = charlie_counts['msg4'] > 0  # Should be TRUE
+
+    lines.append(f"  Alice total decryptions: {alice_decrypts}")
+    lines.append(f"  Bob total decryptions: {bob_decrypts}")
+    lines.append(f"  Charlie total decryptions: {charlie_decrypts}")
+    lines.append(f"  Bob received msg1 (before kick): {bob_got_msg1}")
+    lines.append(f"  Alice received msg2 (Bob's reply): {alice_got_msg2}")
+    lines.append(f"  Alice received msg3 (Charlie's reply): {alice_got_msg3}")
+    lines.append(f"  Charlie received msg2 (Bob's reply): {charlie_got_msg3}")
+    lines.append(f"  Bob received msg4 (after kick): {bob_got_msg4} (should be False!)")
+    lines.append(f"  Charlie received msg4 (after kick): {charlie_got_msg4} (should be True!)\n")
+
+    tests_passed = 0
+
+    # Test 1: Bob decrypted Alice's first message
+    if bob_got_msg1:
+        lines.append(ok("Bob decrypted: 'Message 1: Before kick'"))
+        tests_passed += 1
+    else:
+        lines.append(fail("Bob didn't receive Alice's message before kick"))
+
+    # Test 2: Alice decrypted Bob's reply
+    if alice_got_msg2:
+        lines.append(ok("Alice decrypted: 'Message 2: Bob reply before kick'"))
+        tests_passed += 1
+    else:
+        lines.append(fail("Alice didn't receive Bob's reply"))
+
+    # Test 3: Alice decrypted Charlie's reply
+    if alice_got_msg3:
+        lines.append(ok("Alice decrypted: 'Message 3: Charlie reply before kick'"))
+        tests_passed += 1
+    else:
+        lines.append(fail("Alice didn't receive Charlie's reply"))
+
+    # Test 4: All could decrypt before kick
+    if bob_decrypts >= 3 and alice_decrypts >= 2 and charlie_decrypts >= 3:
+        lines.append(ok("Three-way E2EE working before kick"))
+        tests_passed += 1
+    else:
+        lines.append(fail("E2EE not working for all members before kick"))
+
+    # Test 5: Member remove command succeeded
+    if alice_counts['removed'] or alice_counts['rotated'] or alice_counts['no_decrypt']:
+        lines.append(ok("Alice successfully kicked Bob (MLS keys rotated)"))
+        tests_passed += 1
+    else:
+        lines.append(f"{Color.YELLOW}⚠{Color.NC}  Cannot confirm kick succeeded (check logs)")
+
+    # Test 6: Bob did NOT decrypt message after kick (CRITICAL)
+    if not bob_got_msg4:
+        lines.append(ok("Bob CANNOT decrypt message after kick (correct!)"))
+        tests_passed += 1
+    else:
+        lines.append(fail("Bob decrypted message after kick (SECURITY ISSUE!)"))
+
+    # Test 7: Charlie CAN still decrypt after Bob's kick (CRITICAL)
+    if charlie_got_msg4:
+        lines.append(ok("Charlie CAN decrypt message after Bob's kick (correct!)"))
+        tests_passed += 1
+    else:
+        lines.append(fail("Charlie can't decrypt after Bob's kick (incorrect!)"))
+
+    # Test 8: Decryption counts correct
+    if bob_decrypts <= 5 and charlie_decrypts >= 4:  # Bob should stop, Charlie should continue
+        lines.append(ok("Decryption counts correct (Bob ≤5, Charlie ≥4)"))
+        tests_passed += 1
+    else:
+        lines.append(fail(f"Decryption counts wrong (Bob: {bob_decrypts}, Charlie: {charlie_decrypts})"))
+
+    return tests_passed
+
+# Everything that differs between the scenarios; the group setup is shared
+SCENARIOS = {
+    'basic': {
+        'title': 'MLS Three Members Test',
+        'log_tag': '3m',
+        'space': 'three-members',
+        'thread': 'Three Members Test',
+        'welcome_wait': 15,  # Ceiling only; Bob's join is usually logged within a second
+        'charlie_wait': 8,  # Wait for Welcome message AND for Bob to receive Commit (epoch update)
+        'result_re': BASIC_RESULT_RE,
+        'exchange': exchange_basic,
+        'report': report_basic,
+        'tests_total': 5,
+        'partial': 3,
+        'success': [
+            '🎉 SUCCESS! Three-member MLS group works perfectly!',
+            '   ✓ Alice → Bob: Encrypted and decrypted',
+            '   ✓ Alice → Charlie: Encrypted and decrypted',
+            '   ✓ All three members in sync!'
+        ]
+    },
+    'kick': {
+        'title': 'MLS Three Members + Kick Test',
+        'log_tag': '3kick',
+        'space': 'kick-test',
+        'thread': 'Kick Test',
+        'welcome_wait': 4,
+        'charlie_wait': 4,  # Wait for Welcome message and Commit
+        'result_re': KICK_RESULT_RE,
+        'exchange': exchange_kick,
+        'report': report_kick,
+        'tests_total': 8,
+        'partial': 6,
+        'success': [
+            '🎉 SUCCESS! Three-member kick working correctly!',
+            '   ✓ All three could communicate before kick',
+            '   ✓ Bob CANNOT decrypt after kick',
+            "   ✓ Charlie CAN still decrypt after Bob's kick"
+        ]
+    }
+}
+
+async def run_scenario(name, args):
+    """Run one scenario from SCENARIOS against three fresh clients; returns the exit status"""
+    scenario = SCENARIOS[name]
+    print(f"{Color.CYAN}╔═══════════════════════════════════════════════╗{Color.NC}")
+    print(f"{Color.CYAN}║  {scenario['title']:<45}║{Color.NC}")
+    print(f"{Color.CYAN}╚═══════════════════════════════════════════════╝{Color.NC}\n")
+
+    # Cleanup
+    prefix = args.data_prefix
+    tag = scenario['log_tag']
+    alice_log, bob_log, charlie_log = (f'{prefix}{member}_{tag}' for member in ('alice', 'bob', 'charlie'))
+    cleanup((alice_log, bob_log, charlie_log), prefix)
+
+    # Build (use debug build since it's faster and we already have it)
+    binary_path = build_once('debug')
+    if not binary_path:
+        return 1
+
+    # Start clients; data directories are per scenario so one interpreter
+    # can run several scenarios back to back
+    print(f"{Color.CYAN}Starting Alice, Bob, and Charlie...{Color.NC}")
+
+    base = args.port_base
+    alice = SpacewayClient('Alice', f'{prefix}alice.key', base, f'{alice_log}.log', binary_path,
+                           os.path.join(scratch_dir(), f'{alice_log}-data'))
+    bob = SpacewayClient('Bob', f'{prefix}bob.key', base + 1, f'{bob_log}.log', binary_path,
+                         os.path.join(scratch_dir(), f'{bob_log}-data'))
+    charlie = SpacewayClient('Charlie', f'{prefix}charlie.key', base + 2, f'{charlie_log}.log', binary_path,
+                             os.path.join(scratch_dir(), f'{charlie_log}-data'))
+    clients = (alice, bob, charlie)
+
+    try:
+        await start_all(clients)
+        print(f"{Color.GREEN}✓ Alice, Bob, and Charlie started{Color.NC}\n")
+
+        # Setup
+        print(f"{Color.CYAN}Setting up KeyPackages and Space...{Color.NC}")
+        await publish_keypackages(clients)
+        # The IDs are fixed per process; fetch them once, side by side
+        await asyncio.gather(alice.identify(peer_id=True), bob.identify(), charlie.identify())
+
+        await alice.send_command(f"space create {scenario['space']}", wait=3, wait_for=ACK_SPACE_CREATED)
+        space_id = alice.find_in_log('space_short')
+        if not space_id:
+            print(f"{Color.RED}✗ Failed to create space{Color.NC}")
+            return 1
+
+        await alice.send_command('context', wait=2, wait_for=ACK_CONTEXT)
+        full_space_id = alice.find_in_log('space_full')
+
+        await alice.send_command('invite create', wait=3, wait_for=ACK_INVITE)
+        invite = alice.find_in_log('invite')
+
+        print(f"{Color.GREEN}✓ Setup complete{Color.NC}\n")
+
+        # Bob and Charlie join independently of each other
+        print(f"{Color.CYAN}Bob and Charlie connecting and joining...{Color.NC}")
+
+        async def join(client):
+            await client.send_command(f'connect /ip4/127.0.0.1/tcp/{alice.port}/p2p/{alice.peer_id}', wait=3, wait_for=ACK_CONNECTED)
+            await client.send_command(f'join {full_space_id} {invite}', wait=5, wait_for=ACK_JOINED)
+
+        await asyncio.gather(join(bob), join(charlie))
+
+        print(f"{Color.GREEN}✓ Bob and Charlie joined{Color.NC}\n")
+
+        # Add Bob to MLS
+        print(f"{Color.CYAN}Adding Bob to MLS group...{Color.NC}")
+        bob.expect_ack(ACK_MLS_JOINED)
+        await alice.send_command(f'member add {bob.user_id}', wait=5, wait_for=ACK_MEMBER_ADDED)
+        # Wait for the Welcome to be processed before adding the next member
+        await bob.wait_for(ACK_MLS_JOINED, scenario['welcome_wait'])
+        print(f"{Color.GREEN}✓ Bob added to MLS{Color.NC}\n")
+
+        # Add Charlie to MLS
+        print(f"{Color.CYAN}Adding Charlie to MLS group...{Color.NC}")
+        # Only the Commit adding Charlie counts, not one Bob processed earlier
+        charlie.expect_ack(ACK_MLS_JOINED)
+        bob.expect_ack(ACK_COMMIT)
+        await alice.send_command(f'member add {charlie.user_id}', wait=5, wait_for=ACK_MEMBER_ADDED)
+        await asyncio.gather(
+            charlie.wait_for(ACK_MLS_JOINED, scenario['charlie_wait']),
+            bob.wait_for(ACK_COMMIT, scenario['charlie_wait'])
+        )
+        print(f"{Color.GREEN}✓ Charlie added to MLS{Color.NC}\n")
+
+        # Alice creates the channel and thread, then the scenario's messages go out
+        print(f"{Color.CYAN}Alice creating channel and sending message...{Color.NC}")
+        await alice.send_command('channel create general', wait=3, wait_for=ACK_CHANNEL_CREATED)
+        await alice.send_command(f"thread create \"{scenario['thread']}\"", wait=3, wait_for=ACK_THREAD_CREATED)
+        await scenario['exchange'](alice, bob, charlie, space_id)
+
+        # Check results, collecting the report so it is written in one go
+        lines = []
+        lines.append(f"\n{Color.CYAN}{'='*50}{Color.NC}")
+        lines.append(f"{Color.CYAN}Results{Color.NC}")
+        lines.append(f"{Color.CYAN}{'='*50}{Color.NC}\n")
+
+        result_re = scenario['result_re']
+        tests_passed = scenario['report'](
+            alice.tally_output(result_re), bob.tally_output(result_re), charlie.tally_output(result_re), lines
+        )
+        tests_total = scenario['tests_total']
+
+        lines.append(f"\n{Color.CYAN}Score: {tests_passed}/{tests_total}{Color.NC}")
+
+        if tests_passed == tests_total:
+            success = scenario['success']
+            lines.append(f"\n{Color.GREEN}{success[0]}{Color.NC}")
+            lines.extend(f"{Color.GREEN}{line}{Color.NC}" for line in success[1:])
+            status = 0
+        elif tests_passed >= scenario['partial']:
+            lines.append(f"\n{Color.YELLOW}⚠️  PARTIAL SUCCESS ({tests_passed}/{tests_total}){Color.NC}")
+            status = 0
+        else:
+            lines.append(f"\n{Color.RED}❌ TEST FAILED ({tests_passed}/{tests_total}){Color.NC}")
+            lines.append(f"Check logs: {', '.join(client.log_file for client in clients)}")
+            status = 1
+
+        sys.stdout.write('\n'.join(lines) + '\n')
+        return status
+
+    finally:
+        await asyncio.gather(*(client.stop() for client in clients))
+
+async def main(args):
+    status = 0
+    for name in args.scenarios:
+        status |= await run_scenario(name, args)
+    return status
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(parse_harness_args(__doc__, scenarios=list(SCENARIOS)))))
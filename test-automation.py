@@ -4,6 +4,7 @@ Automated Testing Framework for Spaceway MLS E2EE
 This script automates the complete Alice & Bob workflow and captures all output for analysis.
 """
 
+import codecs
 import subprocess
 import time
 import re
@@ -21,6 +22,8 @@ class Color:
     NC = '\033[0m'
 
 class SpacewayClient:
+    __slots__ = ('name', 'account', 'port', 'log_file', 'process', 'log_handle', 'log_reader', 'decoder', 'buf')
+
     def __init__(self, name, account, port, log_file):
         self.name = name
         self.account = account
@@ -28,12 +31,16 @@ class SpacewayClient:
         self.log_file = log_file
         self.process = None
         self.log_handle = None
+        self.log_reader = None
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.buf = ''
         
     def start(self):
         """Start the Spaceway client"""
         print(f"{Color.BLUE}Starting {self.name} (port {self.port})...{Color.NC}")
         
-        self.log_handle = open(self.log_file, 'w')
+        self.log_handle = open(self.log_file, 'wb', buffering=0)
+        self.log_reader = open(self.log_file, 'rb')
         
         cmd = [
             './target/release/spaceway',
@@ -46,18 +53,31 @@ class SpacewayClient:
             stdin=subprocess.PIPE,
             stdout=self.log_handle,
             stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1
+            bufsize=0,
+            close_fds=False  # Allows the posix_spawn fast path; our fds are non-inheritable
         )
         
-        time.sleep(3)  # Wait for startup
-        print(f"{Color.GREEN}{self.name} started (PID: {self.process.pid}){Color.NC}")
+        if self.wait_until_listening():
+            print(f"{Color.GREEN}{self.name} started (PID: {self.process.pid}){Color.NC}")
+        else:
+            print(f"{Color.RED}{self.name} did not start listening on port {self.port}{Color.NC}")
+        
+    def wait_until_listening(self, timeout=5):
+        """Wait until the log shows the client listening on its own port"""
+        ready = re.compile(r'Listening on /ip4/[0-9.]+/tcp/%d\b' % self.port)
+        deadline = time.monotonic() + timeout
+        while not ready.search(self.buf):
+            if self.tail():
+                continue
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
         
     def send_command(self, command, wait=2):
         """Send a command to the client"""
         print(f"{Color.YELLOW}[{self.name}]{Color.NC} > {command}")
-        self.process.stdin.write(command + '\n')
-        self.process.stdin.flush()
+        self.process.stdin.write(command.encode() + b'\n')
         time.sleep(wait)
         
     def stop(self):
@@ -70,11 +90,23 @@ class SpacewayClient:
                 self.process.kill()
         if self.log_handle:
             self.log_handle.close()
+        if self.log_reader:
+            self.tail()
+            self.log_reader.close()
+            self.log_reader = None
             
+    def tail(self):
+        """Read only what was appended to the log since the last call and return it"""
+        if not self.log_reader:
+            return ''
+        text = self.decoder.decode(self.log_reader.read())
+        self.buf += text
+        return text
+        
     def read_log(self):
-        """Read the entire log file"""
-        with open(self.log_file, 'r') as f:
-            return f.read()
+        """Return the entire log, reading only the part not seen yet"""
+        self.tail()
+        return self.buf
             
     def find_in_log(self, pattern):
         """Find a pattern in the log and return the match"""
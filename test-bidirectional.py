@@ -4,191 +4,152 @@ Test bidirectional E2EE messaging between Alice and Bob
 Focuses on ensuring both can encrypt and decrypt each other's messages
 """
 
-import subprocess
-import time
+import asyncio
 import re
-import os
 import sys
 
-class Color:
-    GREEN = '\033[0;32m'
-    RED = '\033[0;31m'
-    CYAN = '\033[0;36m'
-    YELLOW = '\033[1;33m'
-    NC = '\033[0m'
+from _testutil import (
+    ACK_CHANNEL_CREATED, ACK_CHANNEL_SWITCHED, ACK_CONNECTED, ACK_CONTEXT, ACK_INVITE,
+    ACK_JOINED, ACK_MEMBER_ADDED, ACK_MLS_JOINED, ACK_NETWORK, ACK_PUBLISHED,
+    ACK_SENT, ACK_SPACE_CREATED, ACK_SPACE_SWITCHED, ACK_THREAD_CREATED,
+    ACK_THREAD_SWITCHED, ACK_WHOAMI,
+    Color, SpacewayClient, build_once, cleanup, compile_checks
+)
 
-def run_command(client, cmd, wait=2):
-    """Send command to client"""
-    print(f"{Color.CYAN}[{client['name']}]{Color.NC} {cmd}")
-    client['proc'].stdin.write(cmd + '\n')
-    client['proc'].stdin.flush()
-    time.sleep(wait)
+THREAD_PAT = re.compile(rb'([0-9a-f]{16})\s+-\s+"?Bidir Test"?')
 
-def find_in_log(log_file, pattern):
-    """Find pattern in log file"""
-    try:
-        with open(log_file, 'r') as f:
-            content = f.read()
-            match = re.search(pattern, content)
-            return match.group(1) if match else None
-    except:
-        return None
-
-def check_log(log_file, pattern):
-    """Check if pattern exists in log"""
-    try:
-        with open(log_file, 'r') as f:
-            return bool(re.search(pattern, f.read()))
-    except:
-        return False
+# Result checks, merged into one alternation so each log is scanned once
+RESULT_RE = compile_checks([
+    ('decrypt', rb'Decrypted (?:Space MLS|Channel MLS|queued) message'),
+    ('hello', rb'Can you decrypt this'),
+    ('reply', rb'I can decrypt AND send'),
+    ('perfect', rb'Bidirectional E2EE confirmed')
+])
 
-def main():
+async def main():
     print(f"{Color.CYAN}╔═══════════════════════════════════════════════╗{Color.NC}")
     print(f"{Color.CYAN}║  Bidirectional E2EE Messaging Test            ║{Color.NC}")
     print(f"{Color.CYAN}╚═══════════════════════════════════════════════╝{Color.NC}\n")
     
     # Cleanup
-    os.system('rm -rf *-data/ *.key *.history alice_bidir.log bob_bidir.log 2>/dev/null')
+    cleanup(('alice_bidir', 'bob_bidir'))
     
     # Build (use debug build since it's faster and we already have it)
-    binary_path = './target/debug/spaceway'
-    
-    # Check if binary exists
-    if not os.path.exists(binary_path):
-        print(f"{Color.CYAN}Building debug version (this may take a while)...{Color.NC}")
-        build_result = subprocess.run(
-            ['cargo', '+nightly', 'build'],
-            capture_output=True,
-            text=True
-        )
-        
-        if build_result.returncode != 0:
-            print(f"{Color.RED}Build failed!{Color.NC}")
-            print(build_result.stderr[-500:] if len(build_result.stderr) > 500 else build_result.stderr)
-            return 1
-        
-        print(f"{Color.GREEN}✓ Build completed{Color.NC}")
-    else:
-        print(f"{Color.GREEN}✓ Using existing binary{Color.NC}")
+    binary_path = build_once('debug')
+    if not binary_path:
+        return 1
     
     # Start clients
-    alice_log = open('alice_bidir.log', 'w')
-    bob_log = open('bob_bidir.log', 'w')
-    
     print(f"{Color.CYAN}Starting Alice and Bob...{Color.NC}")
     
-    alice = {
-        'name': 'Alice',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', 'alice.key', '--port', '9001'],
-            stdin=subprocess.PIPE, stdout=alice_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': 'alice_bidir.log'
-    }
-    
-    bob = {
-        'name': 'Bob',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', 'bob.key', '--port', '9002'],
-            stdin=subprocess.PIPE, stdout=bob_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': 'bob_bidir.log'
-    }
+    alice = SpacewayClient('Alice', 'alice.key', 9001, 'alice_bidir.log', binary_path)
+    bob = SpacewayClient('Bob', 'bob.key', 9002, 'bob_bidir.log', binary_path)
+    await asyncio.gather(alice.start(), bob.start())
     
     try:
+        # Both clients warm up in parallel; wait until each one is listening
+        await asyncio.gather(
+            alice.await_ready(),
+            bob.await_ready()
+        )
         print(f"{Color.GREEN}✓ Alice and Bob started{Color.NC}\n")
-        time.sleep(3)
         
         # Setup
         print(f"{Color.CYAN}Setting up KeyPackages and Space...{Color.NC}")
-        run_command(alice, 'keypackage publish', wait=5)
-        run_command(bob, 'keypackage publish', wait=5)
+        await asyncio.gather(
+            alice.send_command('keypackage publish', wait=5, wait_for=ACK_PUBLISHED),
+            bob.send_command('keypackage publish', wait=5, wait_for=ACK_PUBLISHED)
+        )
         
-        run_command(alice, 'space create bidir-test', wait=3)
-        space_id = find_in_log(alice['log'], r'Created space: .+? \(([0-9a-f]{16})\)')
+        await alice.send_command('space create bidir-test', wait=3, wait_for=ACK_SPACE_CREATED)
+        space_id = alice.find_in_log('space_short')
         if not space_id:
             print(f"{Color.RED}✗ Failed to create space{Color.NC}")
             return 1
         
-        run_command(alice, 'context', wait=2)
-        full_space_id = find_in_log(alice['log'], r'Space: ([0-9a-f]{64})')
+        await alice.send_command('context', wait=2, wait_for=ACK_CONTEXT)
+        full_space_id = alice.find_in_log('space_full')
         
-        run_command(alice, 'invite create', wait=3)
-        invite = find_in_log(alice['log'], r'Created invite code: (\w+)')
+        await asyncio.gather(
+            alice.send_command('invite create', wait=3, wait_for=ACK_INVITE),
+            bob.send_command('whoami', wait=2, wait_for=ACK_WHOAMI)
+        )
+        invite = alice.find_in_log('invite')
+        bob_id = bob.find_in_log('user_id')
         
-        run_command(alice, 'network', wait=2)
-        peer_id = find_in_log(alice['log'], r'Peer ID: (\w+)')
+        await alice.send_command('network', wait=2, wait_for=ACK_NETWORK)
+        peer_id = alice.find_in_log('peer_id')
         
         print(f"{Color.GREEN}✓ Setup complete{Color.NC}\n")
         
         # Bob joins
         print(f"{Color.CYAN}Bob connecting and joining...{Color.NC}")
-        run_command(bob, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3)
-        run_command(bob, f'join {full_space_id} {invite}', wait=5)
-        
-        run_command(bob, 'whoami', wait=2)
-        bob_id = find_in_log(bob['log'], r'User ID: ([0-9a-f]{64})')
+        await bob.send_command(f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3, wait_for=ACK_CONNECTED)
+        await bob.send_command(f'join {full_space_id} {invite}', wait=5, wait_for=ACK_JOINED)
         
         print(f"{Color.GREEN}✓ Bob joined{Color.NC}\n")
         
         # Add Bob to MLS
         print(f"{Color.CYAN}Adding Bob to MLS group...{Color.NC}")
-        run_command(alice, f'member add {bob_id}', wait=5)
-        time.sleep(4)  # Wait for Welcome message
+        bob.expect_ack(ACK_MLS_JOINED)
+        await alice.send_command(f'member add {bob_id}', wait=5, wait_for=ACK_MEMBER_ADDED)
+        await bob.wait_for(ACK_MLS_JOINED, 4)  # Wait for Welcome message
         print(f"{Color.GREEN}✓ Bob added to MLS{Color.NC}\n")
         
         # Alice sends first message
         print(f"{Color.CYAN}Alice creating channel and sending message...{Color.NC}")
-        run_command(alice, 'channel create general', wait=3)
-        run_command(alice, 'thread create "Bidir Test"', wait=3)
-        run_command(alice, 'send Hello Bob! Can you decrypt this?', wait=4)
+        await alice.send_command('channel create general', wait=3, wait_for=ACK_CHANNEL_CREATED)
+        await alice.send_command('thread create "Bidir Test"', wait=3, wait_for=ACK_THREAD_CREATED)
+        await alice.send_command('send Hello Bob! Can you decrypt this?', wait=4, wait_for=ACK_SENT)
         
         # Important: Wait for GossipSub propagation
-        print(f"{Color.YELLOW}⏳ Waiting for message propagation (5s)...{Color.NC}")
-        time.sleep(5)
+        print(f"{Color.YELLOW}⏳ Waiting for message propagation (up to 5s)...{Color.NC}")
+        await bob.wait_for(rb'Can you decrypt this', 5)
         
         # Bob navigates and replies
         print(f"\n{Color.CYAN}Bob navigating and replying...{Color.NC}")
-        run_command(bob, f'space {space_id}', wait=2)
-        run_command(bob, 'channels', wait=2)
+        await bob.send_command(f'space {space_id}', wait=2, wait_for=ACK_SPACE_SWITCHED)
+        await bob.send_command('channels', wait=2, wait_for=rb'[0-9a-f]{16}\s+-\s+general')
         
-        channel_id = find_in_log(bob['log'], r'([0-9a-f]{16})\s+-\s+general')
+        channel_id = bob.find_in_log('channel_id')
         if channel_id:
-            run_command(bob, f'channel {channel_id}', wait=2)
-            run_command(bob, 'threads', wait=2)
-            thread_id = find_in_log(bob['log'], r'([0-9a-f]{16})\s+-\s+"?Bidir Test"?')
+            await bob.send_command(f'channel {channel_id}', wait=2, wait_for=ACK_CHANNEL_SWITCHED)
+            await bob.send_command('threads', wait=2, wait_for=rb'[0-9a-f]{16}\s+-\s+"?Bidir Test"?')
+            thread_id = bob.find_in_log('thread_id', THREAD_PAT)
             if thread_id:
-                run_command(bob, f'thread {thread_id}', wait=2)
+                await bob.send_command(f'thread {thread_id}', wait=2, wait_for=ACK_THREAD_SWITCHED)
         
-        run_command(bob, 'send Yes Alice! I can decrypt AND send encrypted messages!', wait=4)
+        await bob.send_command('send Yes Alice! I can decrypt AND send encrypted messages!', wait=4, wait_for=ACK_SENT)
         
         # CRITICAL: Wait for Bob's message to propagate to Alice
-        print(f"{Color.YELLOW}⏳ Waiting for Bob's message to reach Alice (7s)...{Color.NC}")
-        time.sleep(7)
+        print(f"{Color.YELLOW}⏳ Waiting for Bob's message to reach Alice (up to 7s)...{Color.NC}")
+        await alice.wait_for(rb'I can decrypt AND send', 7)
         
         # Alice sends final message
-        run_command(alice, 'send Perfect! Bidirectional E2EE confirmed!', wait=4)
+        await alice.send_command('send Perfect! Bidirectional E2EE confirmed!', wait=4, wait_for=ACK_SENT)
         
         # CRITICAL: Final wait for ALL messages to propagate through GossipSub
         # This ensures Alice receives Bob's message and Bob receives Alice's second message
-        print(f"{Color.YELLOW}⏳ Final propagation wait (10s) - ensuring all messages delivered...{Color.NC}")
-        time.sleep(10)
-        
-        # Close logs
-        alice_log.close()
-        bob_log.close()
+        print(f"{Color.YELLOW}⏳ Final propagation wait (up to 10s) - ensuring all messages delivered...{Color.NC}")
+        await asyncio.gather(
+            alice.wait_for_counts(RESULT_RE, {'decrypt': 1, 'reply': 1}, 10),
+            bob.wait_for_counts(RESULT_RE, {'decrypt': 3, 'hello': 1, 'perfect': 1}, 10)
+        )
         
         # Check results
         print(f"\n{Color.CYAN}{'='*50}{Color.NC}")
         print(f"{Color.CYAN}Results{Color.NC}")
         print(f"{Color.CYAN}{'='*50}{Color.NC}\n")
         
-        alice_decrypts = len(re.findall(r'Decrypted MLS message', open(alice['log']).read()))
-        bob_decrypts = len(re.findall(r'Decrypted MLS message', open(bob['log']).read()))
+        alice_counts = alice.tally_output(RESULT_RE)
+        bob_counts = bob.tally_output(RESULT_RE)
+        
+        alice_decrypts = alice_counts['decrypt']
+        bob_decrypts = bob_counts['decrypt']
         
-        bob_got_hello = check_log(bob['log'], r'Can you decrypt this')
-        alice_got_reply = check_log(alice['log'], r'I can decrypt AND send')
-        bob_got_perfect = check_log(bob['log'], r'Bidirectional E2EE confirmed')
+        bob_got_hello = bob_counts['hello'] > 0
+        alice_got_reply = alice_counts['reply'] > 0
+        bob_got_perfect = bob_counts['perfect'] > 0
         
         print(f"  Alice decryptions: {alice_decrypts}")
         print(f"  Bob decryptions: {bob_decrypts}\n")
@@ -237,14 +198,7 @@ def main():
             return 1
             
     finally:
-        alice['proc'].terminate()
-        bob['proc'].terminate()
-        try:
-            alice['proc'].wait(timeout=3)
-            bob['proc'].wait(timeout=3)
-        except:
-            alice['proc'].kill()
-            bob['proc'].kill()
+        await asyncio.gather(alice.stop(), bob.stop())
 
 if __name__ == '__main__':
-    sys.exit(main())
+    sys.exit(asyncio.run(main()))
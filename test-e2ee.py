@@ -4,144 +4,114 @@ Spaceway MLS E2EE Bidirectional Messaging Test
 Tests that both Alice and Bob can send and decrypt each other's encrypted messages.
 """
 
-import subprocess
-import time
+import asyncio
 import re
-import os
 
-class Color:
-    RED = '\033[0;31m'
-    GREEN = '\033[0;32m'
-    YELLOW = '\033[1;33m'
-    BLUE = '\033[0;34m'
-    CYAN = '\033[0;36m'
-    NC = '\033[0m'
+from _testutil import (
+    ACK_CHANNEL_CREATED, ACK_CHANNEL_SWITCHED, ACK_CONNECTED, ACK_CONTEXT, ACK_INVITE,
+    ACK_JOINED, ACK_MEMBER_ADDED, ACK_MLS_JOINED, ACK_NETWORK, ACK_PUBLISHED, ACK_SENT,
+    ACK_SPACE_CREATED, ACK_SPACE_LIST, ACK_SPACE_SWITCHED, ACK_THREAD_CREATED,
+    ACK_THREAD_SWITCHED, ACK_WHOAMI,
+    Color, SpacewayClient, build_once, cleanup, compile_checks
+)
 
-class SpacewayClient:
-    def __init__(self, name, account, port, log_file):
-        self.name = name
-        self.account = account
-        self.port = port
-        self.log_file = log_file
-        self.process = None
-        self.log_handle = None
-        
-    def start(self):
-        print(f"{Color.BLUE}Starting {self.name} (port {self.port})...{Color.NC}")
-        self.log_handle = open(self.log_file, 'w')
-        cmd = ['./target/release/spaceway', '--account', self.account, '--port', str(self.port)]
-        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=self.log_handle, 
-                                       stderr=subprocess.STDOUT, text=True, bufsize=1)
-        time.sleep(3)
-        print(f"{Color.GREEN}{self.name} started (PID: {self.process.pid}){Color.NC}")
-        
-    def send_command(self, command, wait=2):
-        print(f"{Color.YELLOW}[{self.name}]{Color.NC} > {command}")
-        self.process.stdin.write(command + '\n')
-        self.process.stdin.flush()
-        time.sleep(wait)
-        
-    def stop(self):
-        if self.process:
-            self.process.terminate()
-            try:
-                self.process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                self.process.kill()
-        if self.log_handle:
-            self.log_handle.close()
-            
-    def read_log(self):
-        with open(self.log_file, 'r') as f:
-            return f.read()
-            
-    def find_in_log(self, pattern):
-        log = self.read_log()
-        match = re.search(pattern, log)
-        return match.group(1) if match else None
-        
-    def check_log(self, pattern):
-        return bool(re.search(pattern, self.read_log()))
+THREAD_PAT = re.compile(rb'([0-9a-f]{16})\s+-\s+"?E2EE Test"?')
 
-def main():
+# Result checks, merged into one alternation so each log is scanned once
+RESULT_RE = compile_checks([
+    ('decrypt', rb'Decrypted (?:Space MLS|Channel MLS|queued) message'),
+    ('hello', rb'Can you read this encrypted message'),
+    ('reply', rb'I can decrypt and reply'),
+    ('perfect', rb'Bidirectional E2EE is working')
+])
+
+async def main():
     # Cleanup
     print(f"{Color.BLUE}Cleaning old test data...{Color.NC}")
-    os.system('rm -rf *-data/ *.key *.history alice_e2ee.log bob_e2ee.log 2>/dev/null')
+    cleanup(('alice_e2ee', 'bob_e2ee'))
     
     # Build
     print(f"\n{Color.BLUE}Building Spaceway...{Color.NC}")
-    if os.system('cargo +nightly build --release 2>&1 | tail -3') != 0:
-        print(f"{Color.RED}Build failed!{Color.NC}")
+    binary_path = build_once('release')
+    if not binary_path:
         return
     
-    alice = SpacewayClient('Alice', 'alice.key', 9001, 'alice_e2ee.log')
-    bob = SpacewayClient('Bob', 'bob.key', 9002, 'bob_e2ee.log')
+    alice = SpacewayClient('Alice', 'alice.key', 9001, 'alice_e2ee.log', binary_path)
+    bob = SpacewayClient('Bob', 'bob.key', 9002, 'bob_e2ee.log', binary_path)
     
     try:
-        alice.start()
-        bob.start()
-        time.sleep(2)
+        print(f"{Color.BLUE}Starting Alice (port 9001) and Bob (port 9002)...{Color.NC}")
+        await asyncio.gather(alice.start(), bob.start())
+        await asyncio.gather(alice.await_ready(), bob.await_ready())
+        print(f"{Color.GREEN}Alice and Bob started{Color.NC}")
         
         # Setup
-        alice.send_command('keypackage publish', wait=5)
-        bob.send_command('keypackage publish', wait=5)
-        
-        alice.send_command('space create bidirectional-test', wait=3)
-        space_id = alice.find_in_log(r'Created space: .+? \(([0-9a-f]{16})\)')
-        alice.send_command('context', wait=2)
-        full_space_id = alice.find_in_log(r'Space: ([0-9a-f]{64})')
+        await asyncio.gather(
+            alice.send_command('keypackage publish', wait=5, wait_for=ACK_PUBLISHED),
+            bob.send_command('keypackage publish', wait=5, wait_for=ACK_PUBLISHED)
+        )
         
-        alice.send_command('invite create', wait=3)
-        invite = alice.find_in_log(r'Created invite code: (\w+)')
+        await alice.send_command('space create bidirectional-test', wait=3, wait_for=ACK_SPACE_CREATED)
+        space_id = alice.find_in_log('space_short')
+        await alice.send_command('context', wait=2, wait_for=ACK_CONTEXT)
+        full_space_id = alice.find_in_log('space_full')
         
-        alice.send_command('network', wait=2)
-        peer_id = alice.find_in_log(r'Peer ID: (\w+)')
+        await asyncio.gather(
+            alice.send_command('invite create', wait=3, wait_for=ACK_INVITE),
+            bob.send_command('whoami', wait=2, wait_for=ACK_WHOAMI)
+        )
+        invite = alice.find_in_log('invite')
+        bob_id = bob.find_in_log('user_id')
         
-        bob.send_command(f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3)
-        bob.send_command(f'join {full_space_id} {invite}', wait=5)
+        await alice.send_command('network', wait=2, wait_for=ACK_NETWORK)
+        peer_id = alice.find_in_log('peer_id')
         
-        bob.send_command('whoami', wait=2)
-        bob_id = bob.find_in_log(r'User ID: ([0-9a-f]{64})')
+        await bob.send_command(f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3, wait_for=ACK_CONNECTED)
+        await bob.send_command(f'join {full_space_id} {invite}', wait=5, wait_for=ACK_JOINED)
         
-        alice.send_command(f'member add {bob_id}', wait=5)
-        time.sleep(3)
+        bob.expect_ack(ACK_MLS_JOINED)
+        await alice.send_command(f'member add {bob_id}', wait=5, wait_for=ACK_MEMBER_ADDED)
+        await bob.wait_for(ACK_MLS_JOINED, 3)
         
         # Alice sends first message
-        alice.send_command('channel create general', wait=3)
-        alice.send_command('thread create "E2EE Test"', wait=3)
-        alice.send_command('send Hello Bob! Can you read this encrypted message?', wait=4)
-        time.sleep(3)
+        await alice.send_command('channel create general', wait=3, wait_for=ACK_CHANNEL_CREATED)
+        await alice.send_command('thread create "E2EE Test"', wait=3, wait_for=ACK_THREAD_CREATED)
+        await alice.send_command('send Hello Bob! Can you read this encrypted message?', wait=4, wait_for=ACK_SENT)
+        await bob.wait_for(rb'Can you read this encrypted message', 3)
         
         # Bob navigates and sends reply
-        bob.send_command('space list', wait=2)
-        bob.send_command(f'space {space_id}', wait=2)
-        bob.send_command('channels', wait=2)
-        channel_id = bob.find_in_log(r'([0-9a-f]{16})\s+-\s+general')
+        await bob.send_command('space list', wait=2, wait_for=ACK_SPACE_LIST)
+        await bob.send_command(f'space {space_id}', wait=2, wait_for=ACK_SPACE_SWITCHED)
+        await bob.send_command('channels', wait=2, wait_for=rb'[0-9a-f]{16}\s+-\s+general')
+        channel_id = bob.find_in_log('channel_id')
         if channel_id:
-            bob.send_command(f'channel {channel_id}', wait=2)
-            bob.send_command('threads', wait=2)
-            thread_id = bob.find_in_log(r'([0-9a-f]{16})\s+-\s+"?E2EE Test"?')
+            await bob.send_command(f'channel {channel_id}', wait=2, wait_for=ACK_CHANNEL_SWITCHED)
+            await bob.send_command('threads', wait=2, wait_for=rb'[0-9a-f]{16}\s+-\s+"?E2EE Test"?')
+            thread_id = bob.find_in_log('thread_id', THREAD_PAT)
             if thread_id:
-                bob.send_command(f'thread {thread_id}', wait=2)
+                await bob.send_command(f'thread {thread_id}', wait=2, wait_for=ACK_THREAD_SWITCHED)
         
-        bob.send_command('send Yes Alice! I can decrypt and reply with encryption!', wait=4)
-        time.sleep(3)
+        await bob.send_command('send Yes Alice! I can decrypt and reply with encryption!', wait=4, wait_for=ACK_SENT)
+        await alice.wait_for(rb'I can decrypt and reply', 3)
         
         # Alice sends another message
-        alice.send_command('send Perfect! Bidirectional E2EE is working!', wait=4)
-        time.sleep(3)
+        await alice.send_command('send Perfect! Bidirectional E2EE is working!', wait=4, wait_for=ACK_SENT)
+        await bob.wait_for(rb'Bidirectional E2EE is working', 3)
         
         # Check results
         print(f"\n{Color.BLUE}{'='*60}{Color.NC}")
         print(f"{Color.BLUE}Test Results{Color.NC}")
         print(f"{Color.BLUE}{'='*60}{Color.NC}\n")
         
-        alice_decrypts = len(re.findall(r'Decrypted MLS message', alice.read_log()))
-        bob_decrypts = len(re.findall(r'Decrypted MLS message', bob.read_log()))
+        alice_counts = alice.tally_output(RESULT_RE)
+        bob_counts = bob.tally_output(RESULT_RE)
+        
+        alice_decrypts = alice_counts['decrypt']
+        bob_decrypts = bob_counts['decrypt']
         
-        bob_got_hello = bob.check_log(r'Can you read this encrypted message')
-        alice_got_reply = alice.check_log(r'I can decrypt and reply')
-        bob_got_perfect = bob.check_log(r'Bidirectional E2EE is working')
+        bob_got_hello = bob_counts['hello'] > 0
+        alice_got_reply = alice_counts['reply'] > 0
+        bob_got_perfect = bob_counts['perfect'] > 0
         
         print(f"{Color.CYAN}Alice decryptions:{Color.NC} {alice_decrypts}")
         print(f"{Color.CYAN}Bob decryptions:{Color.NC} {bob_decrypts}")
@@ -180,8 +150,7 @@ def main():
             print(f"{Color.YELLOW}⚠ Some tests failed - check logs for details{Color.NC}\n")
             
     finally:
-        alice.stop()
-        bob.stop()
+        await asyncio.gather(alice.stop(), bob.stop())
 
 if __name__ == '__main__':
-    main()
+    asyncio.run(main())
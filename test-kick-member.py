@@ -5,187 +5,155 @@ Tests: Alice creates space → invites Bob → both exchange messages →
        Alice kicks Bob → Alice sends message → Bob CANNOT decrypt
 """
 
-import subprocess
-import time
+import asyncio
 import re
-import os
 import sys
 
-class Color:
-    GREEN = '\033[0;32m'
-    RED = '\033[0;31m'
-    CYAN = '\033[0;36m'
-    YELLOW = '\033[1;33m'
-    NC = '\033[0m'
+from _testutil import (
+    ACK_CHANNEL_CREATED, ACK_CHANNEL_SWITCHED, ACK_CONNECTED, ACK_CONTEXT, ACK_INVITE,
+    ACK_JOINED, ACK_MEMBER_ADDED, ACK_MLS_JOINED, ACK_NETWORK, ACK_PUBLISHED,
+    ACK_REMOVED, ACK_SENT, ACK_SPACE_CREATED, ACK_SPACE_SWITCHED, ACK_THREAD_CREATED,
+    ACK_THREAD_SWITCHED, ACK_WHOAMI,
+    Color, SpacewayClient, build_once, cleanup, compile_checks
+)
 
-def run_command(client, cmd, wait=2):
-    """Send command to client"""
-    print(f"{Color.CYAN}[{client['name']}]{Color.NC} {cmd}")
-    client['proc'].stdin.write(cmd + '\n')
-    client['proc'].stdin.flush()
-    time.sleep(wait)
+THREAD_PAT = re.compile(rb'([0-9a-f]{16})\s+-\s+"?Kick Test"?')
 
-def find_in_log(log_file, pattern):
-    """Find pattern in log file"""
-    try:
-        with open(log_file, 'r') as f:
-            content = f.read()
-            match = re.search(pattern, content)
-            return match.group(1) if match else None
-    except:
-        return None
-
-def check_log(log_file, pattern):
-    """Check if pattern exists in log"""
-    try:
-        with open(log_file, 'r') as f:
-            return bool(re.search(pattern, f.read()))
-    except:
-        return False
+# Result checks, merged into one alternation so each log is scanned once
+RESULT_RE = compile_checks([
+    ('decrypt', rb'Decrypted (?:Space MLS|Channel MLS|queued) message'),
+    ('msg1', rb'Before kick'),
+    ('msg2', rb'Bob reply before kick'),
+    ('msg3', rb'After kick'),
+    ('removed', rb'Successfully removed user'),
+    ('rotated', rb'MLS keys rotated'),
+    ('no_decrypt', rb"(?i:removed member can't decrypt)"),
+    ('removing', rb'Removing user'),
+    # A message Bob got but couldn't read; one he did read counts as 'decrypt'
+    ('rejected', rb'Failed to decrypt MLS message|Message from future epoch')
+])
 
-def main():
+async def main():
     print(f"{Color.CYAN}╔═══════════════════════════════════════════════╗{Color.NC}")
     print(f"{Color.CYAN}║  MLS Member Kick Test                         ║{Color.NC}")
     print(f"{Color.CYAN}╚═══════════════════════════════════════════════╝{Color.NC}\n")
     
     # Cleanup
-    os.system('rm -rf *-data/ *.key *.history alice_kick.log bob_kick.log 2>/dev/null')
+    cleanup(('alice_kick', 'bob_kick'))
     
     # Build (use debug build since it's faster and we already have it)
-    binary_path = './target/debug/spaceway'
-    
-    # Check if binary exists
-    if not os.path.exists(binary_path):
-        print(f"{Color.CYAN}Building debug version (this may take a while)...{Color.NC}")
-        build_result = subprocess.run(
-            ['cargo', '+nightly', 'build'],
-            capture_output=True,
-            text=True
-        )
-        
-        if build_result.returncode != 0:
-            print(f"{Color.RED}Build failed!{Color.NC}")
-            print(build_result.stderr[-500:] if len(build_result.stderr) > 500 else build_result.stderr)
-            return 1
-        
-        print(f"{Color.GREEN}✓ Build completed{Color.NC}")
-    else:
-        print(f"{Color.GREEN}✓ Using existing binary{Color.NC}")
+    binary_path = build_once('debug')
+    if not binary_path:
+        return 1
     
     # Start clients
-    alice_log = open('alice_kick.log', 'w')
-    bob_log = open('bob_kick.log', 'w')
-    
     print(f"{Color.CYAN}Starting Alice and Bob...{Color.NC}")
     
-    alice = {
-        'name': 'Alice',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', 'alice.key', '--port', '9001'],
-            stdin=subprocess.PIPE, stdout=alice_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': 'alice_kick.log'
-    }
-    
-    bob = {
-        'name': 'Bob',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', 'bob.key', '--port', '9002'],
-            stdin=subprocess.PIPE, stdout=bob_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': 'bob_kick.log'
-    }
+    alice = SpacewayClient('Alice', 'alice.key', 9001, 'alice_kick.log', binary_path)
+    bob = SpacewayClient('Bob', 'bob.key', 9002, 'bob_kick.log', binary_path)
+    await asyncio.gather(alice.start(), bob.start())
     
     try:
+        # Both clients warm up in parallel; wait until each one is listening
+        await asyncio.gather(
+            alice.await_ready(),
+            bob.await_ready()
+        )
         print(f"{Color.GREEN}✓ Alice and Bob started{Color.NC}\n")
-        time.sleep(3)
         
         # Setup
         print(f"{Color.CYAN}Setting up KeyPackages and Space...{Color.NC}")
-        run_command(alice, 'keypackage publish', wait=5)
-        run_command(bob, 'keypackage publish', wait=5)
+        await asyncio.gather(
+            alice.send_command('keypackage publish', wait=5, wait_for=ACK_PUBLISHED),
+            bob.send_command('keypackage publish', wait=5, wait_for=ACK_PUBLISHED)
+        )
         
-        run_command(alice, 'space create kick-test', wait=3)
-        space_id = find_in_log(alice['log'], r'Created space: .+? \(([0-9a-f]{16})\)')
+        await alice.send_command('space create kick-test', wait=3, wait_for=ACK_SPACE_CREATED)
+        space_id = alice.find_in_log('space_short')
         if not space_id:
             print(f"{Color.RED}✗ Failed to create space{Color.NC}")
             return 1
         
-        run_command(alice, 'context', wait=2)
-        full_space_id = find_in_log(alice['log'], r'Space: ([0-9a-f]{64})')
+        await alice.send_command('context', wait=2, wait_for=ACK_CONTEXT)
+        full_space_id = alice.find_in_log('space_full')
         
-        run_command(alice, 'invite create', wait=3)
-        invite = find_in_log(alice['log'], r'Created invite code: (\w+)')
+        await asyncio.gather(
+            alice.send_command('invite create', wait=3, wait_for=ACK_INVITE),
+            bob.send_command('whoami', wait=2, wait_for=ACK_WHOAMI)
+        )
+        invite = alice.find_in_log('invite')
+        bob_id = bob.find_in_log('user_id')
         
-        run_command(alice, 'network', wait=2)
-        peer_id = find_in_log(alice['log'], r'Peer ID: (\w+)')
+        await alice.send_command('network', wait=2, wait_for=ACK_NETWORK)
+        peer_id = alice.find_in_log('peer_id')
         
         print(f"{Color.GREEN}✓ Setup complete{Color.NC}\n")
         
         # Bob joins
         print(f"{Color.CYAN}Bob connecting and joining...{Color.NC}")
-        run_command(bob, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3)
-        run_command(bob, f'join {full_space_id} {invite}', wait=5)
-        
-        run_command(bob, 'whoami', wait=2)
-        bob_id = find_in_log(bob['log'], r'User ID: ([0-9a-f]{64})')
+        await bob.send_command(f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3, wait_for=ACK_CONNECTED)
+        await bob.send_command(f'join {full_space_id} {invite}', wait=5, wait_for=ACK_JOINED)
         
         print(f"{Color.GREEN}✓ Bob joined{Color.NC}\n")
         
         # Add Bob to MLS
         print(f"{Color.CYAN}Adding Bob to MLS group...{Color.NC}")
-        run_command(alice, f'member add {bob_id}', wait=5)
-        time.sleep(4)  # Wait for Welcome message
+        bob.expect_ack(ACK_MLS_JOINED)
+        await alice.send_command(f'member add {bob_id}', wait=5, wait_for=ACK_MEMBER_ADDED)
+        await bob.wait_for(ACK_MLS_JOINED, 4)  # Wait for Welcome message
         print(f"{Color.GREEN}✓ Bob added to MLS{Color.NC}\n")
         
         # Alice sends first message
         print(f"{Color.CYAN}Alice creating channel and sending message...{Color.NC}")
-        run_command(alice, 'channel create general', wait=3)
-        run_command(alice, 'thread create "Kick Test"', wait=3)
-        run_command(alice, 'send Message 1: Before kick', wait=4)
+        await alice.send_command('channel create general', wait=3, wait_for=ACK_CHANNEL_CREATED)
+        await alice.send_command('thread create "Kick Test"', wait=3, wait_for=ACK_THREAD_CREATED)
+        await alice.send_command('send Message 1: Before kick', wait=4, wait_for=ACK_SENT)
         
         # Wait for GossipSub propagation
-        print(f"{Color.YELLOW}⏳ Waiting for message propagation (5s)...{Color.NC}")
-        time.sleep(5)
+        print(f"{Color.YELLOW}⏳ Waiting for message propagation (up to 5s)...{Color.NC}")
+        await bob.wait_for(rb'Before kick', 5)
         
         # Bob navigates and replies
         print(f"\n{Color.CYAN}Bob navigating and replying...{Color.NC}")
-        run_command(bob, f'space {space_id}', wait=2)
-        run_command(bob, 'channels', wait=2)
+        await bob.send_command(f'space {space_id}', wait=2, wait_for=ACK_SPACE_SWITCHED)
+        await bob.send_command('channels', wait=2, wait_for=rb'[0-9a-f]{16}\s+-\s+general')
         
-        channel_id = find_in_log(bob['log'], r'([0-9a-f]{16})\s+-\s+general')
+        channel_id = bob.find_in_log('channel_id')
         if channel_id:
-            run_command(bob, f'channel {channel_id}', wait=2)
-            run_command(bob, 'threads', wait=2)
-            thread_id = find_in_log(bob['log'], r'([0-9a-f]{16})\s+-\s+"?Kick Test"?')
+            await bob.send_command(f'channel {channel_id}', wait=2, wait_for=ACK_CHANNEL_SWITCHED)
+            await bob.send_command('threads', wait=2, wait_for=rb'[0-9a-f]{16}\s+-\s+"?Kick Test"?')
+            thread_id = bob.find_in_log('thread_id', THREAD_PAT)
             if thread_id:
-                run_command(bob, f'thread {thread_id}', wait=2)
+                await bob.send_command(f'thread {thread_id}', wait=2, wait_for=ACK_THREAD_SWITCHED)
         
-        run_command(bob, 'send Message 2: Bob reply before kick', wait=4)
+        await bob.send_command('send Message 2: Bob reply before kick', wait=4, wait_for=ACK_SENT)
         
         # Wait for Bob's message
-        print(f"{Color.YELLOW}⏳ Waiting for Bob's message (7s)...{Color.NC}")
-        time.sleep(7)
+        print(f"{Color.YELLOW}⏳ Waiting for Bob's message (up to 7s)...{Color.NC}")
+        await alice.wait_for(rb'Bob reply before kick', 7)
         
         # === KICK BOB ===
         print(f"\n{Color.CYAN}{'='*50}{Color.NC}")
         print(f"{Color.CYAN}Alice kicking Bob from the space...{Color.NC}")
         print(f"{Color.CYAN}{'='*50}{Color.NC}\n")
-        run_command(alice, f'kick {bob_id}', wait=7)
+        await alice.send_command(f'kick {bob_id}', wait=7, wait_for=ACK_REMOVED)
         
         print(f"{Color.GREEN}✓ Bob has been kicked{Color.NC}\n")
         
         # Alice sends message AFTER kick
         print(f"{Color.CYAN}Alice sending message after kicking Bob...{Color.NC}")
-        run_command(alice, 'send Message 3: After kick - Bob should NOT see this', wait=4)
-        
-        # Final wait for message propagation
-        print(f"{Color.YELLOW}⏳ Final propagation wait (10s)...{Color.NC}")
-        time.sleep(10)
-        
-        # Close logs
-        alice_log.close()
-        bob_log.close()
+        bob_counts = bob.tally_output(RESULT_RE)
+        bob_reactions = bob_counts['decrypt'] + bob_counts['rejected']
+        await alice.send_command('send Message 3: After kick - Bob should NOT see this', wait=4, wait_for=ACK_SENT)
+        
+        # Final wait for message propagation: done once everything expected has
+        # arrived and Bob has reacted (decrypted or rejected) to Alice's
+        # post-kick message
+        print(f"{Color.YELLOW}⏳ Final propagation wait (up to 10s)...{Color.NC}")
+        await asyncio.gather(
+            alice.wait_for_counts(RESULT_RE, {'decrypt': 1, 'msg2': 1}, 10),
+            bob.wait_for_counts(RESULT_RE, {'decrypt': 1, 'msg1': 1, ('decrypt', 'rejected'): bob_reactions + 1}, 10)
+        )
         
         # Check results
         print(f"\n{Color.CYAN}{'='*50}{Color.NC}")
@@ -193,16 +161,21 @@ def main():
         print(f"{Color.CYAN}{'='*50}{Color.NC}\n")
         
         # Count decryptions
-        alice_log_content = open(alice['log']).read()
-        bob_log_content = open(bob['log']).read()
-        
-        alice_decrypts = len(re.findall(r'Decrypted MLS message', alice_log_content))
-        bob_decrypts = len(re.findall(r'Decrypted MLS message', bob_log_content))
+        alice_counts = alice.tally_output(RESULT_RE)
+        bob_counts = bob.tally_output(RESULT_RE)
         
         # Check specific messages
-        bob_got_msg1 = 'Before kick' in bob_log_content
-        alice_got_msg2 = 'Bob reply before kick' in alice_log_content
-        bob_got_msg3 = 'After kick' in bob_log_content  # Should be FALSE
+        bob_got_msg1 = bob_counts['msg1'] > 0
+        alice_got_msg2 = alice_counts['msg2'] > 0
+        bob_got_msg3 = bob_counts['msg3'] > 0  # Should be FALSE
+        
+        alice_kicked = (alice_counts['removed'] > 0
+                        or alice_counts['rotated'] > 0
+                        or alice_counts['no_decrypt'] > 0)
+        alice_removing = alice_counts['removing'] > 0
+        
+        alice_decrypts = alice_counts['decrypt']
+        bob_decrypts = bob_counts['decrypt']
         
         print(f"  Alice total decryptions: {alice_decrypts}")
         print(f"  Bob total decryptions: {bob_decrypts}")
@@ -235,13 +208,13 @@ def main():
             print(f"{Color.RED}✗{Color.NC} E2EE not working before kick")
         
         # Test 4: Member remove command succeeded
-        if 'Successfully removed user' in alice_log_content or 'MLS keys rotated' in alice_log_content or 'removed member can\'t decrypt' in alice_log_content.lower():
+        if alice_kicked:
             print(f"{Color.GREEN}✓{Color.NC} Alice successfully kicked Bob (MLS keys rotated)")
             tests_passed += 1
         else:
             print(f"{Color.YELLOW}⚠{Color.NC}  Cannot confirm kick succeeded (check logs)")
             # Check for the actual command output
-            if 'Removing user' in alice_log_content:
+            if alice_removing:
                 print(f"    Debug: Found 'Removing user' command, but no success confirmation")
             else:
                 print(f"    Debug: Kick command may not have been executed")
@@ -278,14 +251,7 @@ def main():
             return 1
             
     finally:
-        alice['proc'].terminate()
-        bob['proc'].terminate()
-        try:
-            alice['proc'].wait(timeout=3)
-            bob['proc'].wait(timeout=3)
-        except:
-            alice['proc'].kill()
-            bob['proc'].kill()
+        await asyncio.gather(alice.stop(), bob.stop())
 
 if __name__ == '__main__':
-    sys.exit(main())
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the Spaceway CLI test scenarios
+Building, client spawning, command/expect plumbing and log scanning used by
+test-permissions.py and test-space-modes.py (and runner.py, which runs them
+in one process)
+"""
+
+import mmap
+import subprocess
+import time
+import re
+import os
+import shutil
+import threading
+
+class Color:
+    GREEN = '\033[0;32m'
+    RED = '\033[0;31m'
+    CYAN = '\033[0;36m'
+    YELLOW = '\033[1;33m'
+    PURPLE = '\033[0;35m'
+    NC = '\033[0m'
+
+BINARY_PATH = './target/debug/spaceway'
+
+# Log patterns every scenario uses, compiled once at import; logs are matched
+# as raw bytes. _FAILED is the CLI's error prefix, so a failing command ends
+# a wait too. Scenario-specific patterns live next to their scenario.
+_FAILED = '✗ '.encode()
+RE_READY = re.compile(rb'Running in non-interactive mode')
+RE_PUBLISHED = re.compile(rb'Published \d+ KeyPackages|Failed to publish KeyPackages')
+RE_SPACE_ID = re.compile(rb'Created space: .+? \(([0-9a-f]{16})\)')
+
+# Setup steps run on several clients at once; keep their echoed lines whole
+_print_lock = threading.Lock()
+
+# Clients of the running scenario; any of them exiting fails every pending wait
+_clients = []
+
+class ClientCrashed(Exception):
+    """A client exited while the scenario was still driving it"""
+    def __init__(self, client):
+        self.client = client
+        returncode = client['proc'].poll()
+        super().__init__(f"{client['name']} exited" +
+                         (f" with code {returncode}" if returncode is not None else ""))
+
+def log_tail(client, size=2048):
+    """The last `size` bytes of the client's log, for showing why it died"""
+    with open(client['log'], 'rb') as f:
+        f.seek(max(0, os.fstat(f.fileno()).st_size - size))
+        return f.read().decode(errors='replace')
+
+def captured(match):
+    """The first group of a bytes match as str, or None without a match"""
+    return match.group(1).decode(errors='replace') if match else None
+
+def reset_test_dir(test_dir):
+    """Remove artifacts of the previous run and recreate the test directory"""
+    shutil.rmtree(test_dir, ignore_errors=True)
+    os.makedirs(test_dir, exist_ok=True)
+
+def build_binary(binary_path=BINARY_PATH):
+    """Make sure the debug binary exists, building it if needed; False on failure"""
+    # SKIP_BUILD=1 leaves building to the caller, e.g. a CI job that builds once
+    if os.environ.get('SKIP_BUILD') == '1':
+        if not os.path.exists(binary_path):
+            print(f"{Color.RED}SKIP_BUILD is set but {binary_path} does not exist{Color.NC}")
+            return False
+        print(f"{Color.GREEN}✓ Using existing binary (SKIP_BUILD){Color.NC}")
+    elif not os.path.exists(binary_path):
+        print(f"{Color.CYAN}Building debug version...{Color.NC}")
+        # Only stderr is kept, and only its tail is printed on failure
+        build_result = subprocess.run(
+            ['cargo', '+nightly', 'build'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+
+        if build_result.returncode != 0:
+            print(f"{Color.RED}Build failed!{Color.NC}")
+            print(build_result.stderr[-2048:].decode(errors='replace'))
+            return False
+
+        print(f"{Color.GREEN}✓ Build completed{Color.NC}")
+    else:
+        print(f"{Color.GREEN}✓ Using existing binary{Color.NC}")
+    return True
+
+def _pump(client):
+    """Copy the client's output into its log as it arrives and run the pending waits on it"""
+    fd = client['proc'].stdout.fileno()
+    try:
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            os.write(client['log_fd'], chunk)
+            with client['lock']:
+                client['unread'] += chunk
+                for check in client['waits']:
+                    check()
+    finally:
+        os.close(client['log_fd'])
+    # EOF: the client is gone, so wake every pending wait to notice
+    try:
+        client['proc'].wait(timeout=2)
+    except subprocess.TimeoutExpired:
+        pass
+    client['exited'] = True
+    for other in list(_clients):
+        with other['lock']:
+            for check in other['waits']:
+                check()
+
+def spawn_client(name, port, test_dir, binary_path=BINARY_PATH):
+    """Start a client on `port` with its key and log in test_dir, and its output pump"""
+    log = f'{test_dir}/{name.lower()}.log'
+    client = {
+        'name': name,
+        'proc': subprocess.Popen(
+            [binary_path, '--account', f'{test_dir}/{name.lower()}.key', '--port', str(port)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=4096
+        ),
+        'log': log,
+        'log_fd': os.open(log, os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+        'lock': threading.Lock(),
+        'unread': b'',
+        'waits': [],
+        'scan_pos': 0,
+        'scan_pending': b'',
+        'decrypt_pos': 0,
+        'decrypt_pending': b'',
+        'decrypts': 0,
+        'exited': False,
+        'view': None
+    }
+    _clients.append(client)
+    client['pump'] = threading.Thread(target=_pump, args=(client,), daemon=True)
+    client['pump'].start()
+    return client
+
+def stop_clients(clients, timeout=2):
+    """Terminate the clients, killing any that outlive `timeout`, and let their pumps drain"""
+    for client in clients:
+        if client in _clients:
+            _clients.remove(client)  # Exiting from here on is expected
+    for client in clients:
+        try:
+            client['proc'].terminate()
+            client['proc'].wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            client['proc'].kill()
+            client['proc'].wait()
+        except ProcessLookupError:
+            pass  # Already gone
+    for client in clients:
+        client['pump'].join(timeout=timeout)
+        if client['view'] is not None:
+            client['view'].close()
+            client['view'] = None
+
+def wait_for_log(client, pattern, timeout=30):
+    """Wait for pattern in the client's output since the previous wait
+
+    The pump re-checks the pattern whenever new output arrives and wakes the
+    wait on the first match, so nothing polls the log file. Output past the
+    match stays unread for the next wait to see. Returns the
+    match, or None after `timeout`; raises ClientCrashed as soon as any
+    client of the scenario exits instead of sitting out the timeout.
+    """
+    done = threading.Event()
+    found = []
+    def check():
+        if not found:
+            match = pattern.search(client['unread'])
+            if match:
+                found.append(match)
+                done.set()
+            elif any(c['exited'] for c in _clients):
+                done.set()
+    with client['lock']:
+        check()
+        client['waits'].append(check)
+    done.wait(timeout)
+    with client['lock']:
+        client['waits'].remove(check)
+        client['unread'] = client['unread'][found[0].end():] if found else b''
+    if not found:
+        for crashed in _clients:
+            if crashed['exited']:
+                raise ClientCrashed(crashed)
+    return found[0] if found else None
+
+def run_command(client, cmd, expect=None, timeout=10):
+    """Send command to client
+
+    With `expect`, waits for that pattern in the output the command produces
+    and returns the match (None on timeout) instead of sleeping a fixed time.
+    """
+    with _print_lock:
+        print(f"{Color.CYAN}[{client['name']}]{Color.NC} {cmd}")
+    try:
+        with client['lock']:
+            client['unread'] = b''  # Skip output from earlier commands
+        # Straight to the pipe: one syscall, no Python-side buffer or flush
+        os.write(client['proc'].stdin.fileno(), (cmd + '\n').encode())
+    except BrokenPipeError:
+        raise ClientCrashed(client) from None
+    except Exception as e:
+        with _print_lock:
+            print(f"{Color.RED}⚠️  [{client['name']}] Error sending command: {e}{Color.NC}")
+        return None
+    if expect is not None:
+        return wait_for_log(client, expect, timeout)
+    time.sleep(0.05)
+
+# Bytes of the previous read kept for the next incremental scan, so a match
+# straddling two reads is still found; longer than any line we look for
+PENDING_BYTES = 256
+
+def read_new(client, cursor):
+    """Return (kept tail of the previous read, that tail plus what the log gained since)
+
+    `cursor` names the reader ('scan' or 'decrypt'): each keeps its own
+    position and tail, so one reader moving on never hides lines from another.
+    """
+    with open(client['log'], 'rb') as f:
+        f.seek(client[f'{cursor}_pos'])
+        data = f.read()
+    client[f'{cursor}_pos'] += len(data)
+    pending = client[f'{cursor}_pending']
+    buf = pending + data
+    client[f'{cursor}_pending'] = buf[-PENDING_BYTES:]
+    return pending, buf
+
+def scan_incremental(client, pattern):
+    """Return the matches of pattern in the client's log that are new since its previous scan
+
+    Only the bytes appended since then are read, plus the kept tail of the
+    previous read; matches lying entirely in that tail were already returned.
+    """
+    pending, buf = read_new(client, 'scan')
+    return [match for match in pattern.finditer(buf) if match.end() > len(pending)]
+
+# The lines the CLI prints for each message it decrypts
+DECRYPTED = (b'Decrypted Space MLS message', b'Decrypted Channel MLS message',
+             b'Decrypted queued message')
+
+def count_decrypts(client):
+    """Add the client's newly decrypted messages to its running count and return it
+
+    Plain substring counts, no regex; occurrences inside the kept tail were
+    counted by the previous call, so they are subtracted back out.
+    """
+    pending, buf = read_new(client, 'decrypt')
+    client['decrypts'] += sum(buf.count(line) - pending.count(line) for line in DECRYPTED)
+    return client['decrypts']
+
+def map_log(path):
+    """Map the log's current contents read-only, or None if it is missing or empty"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        size = os.fstat(fd).st_size
+        if not size:
+            return None
+        mm = mmap.mmap(fd, size, prot=mmap.PROT_READ)
+    finally:
+        os.close(fd)
+    if hasattr(mm, 'madvise'):
+        mm.madvise(mmap.MADV_SEQUENTIAL)  # Scans run front to back
+    return mm
+
+def search_log(client, pattern):
+    """Return (view, first match of pattern) in the client's log, or (view, None)
+
+    The client keeps one read-only mmap of its log for the whole run, and
+    stop_clients unmaps it. It is only remapped when a lookup finds nothing
+    in it and the log has grown since; the new mapping is then searched
+    from just before the old end. The view is None while the log is empty.
+    """
+    view = client['view']
+    if view is not None:
+        match = pattern.search(view)
+        if match:
+            return view, match
+    searched = len(view) if view is not None else 0
+    if os.stat(client['log']).st_size <= searched:
+        return view, None
+    if view is not None:
+        view.close()
+    client['view'] = view = map_log(client['log'])
+    if view is None:
+        return None, None
+    return view, pattern.search(view, max(0, searched - PENDING_BYTES))
+
+def find_in_log(client, pattern):
+    """Find a compiled bytes pattern in the client's log through its persistent view"""
+    _, match = search_log(client, pattern)
+    return match.group(1).decode(errors='replace') if match else None
+
+def check_log(client, pattern, context_lines=0):
+    """Check if pattern exists in the client's log and optionally return context"""
+    mm, match = search_log(client, pattern)
+    if not match:
+        return False, None
+    if context_lines > 0:
+        # Widen the match to whole lines, context_lines either side
+        start = match.start()
+        for _ in range(context_lines + 1):
+            start = mm.rfind(b'\n', 0, start)
+            if start < 0:
+                break
+        end = match.start()
+        for _ in range(context_lines + 1):
+            newline = mm.find(b'\n', end)
+            if newline < 0:
+                end = len(mm)
+                break
+            end = newline + 1
+        return True, mm[start + 1:end].decode(errors='replace').rstrip('\n')
+    return True, None
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Run several test scenarios in one Python process
+The binary is built (or checked) once up front, and the shared helpers and
+their compiled patterns are imported once for all scenarios.
+
+Usage (from the project root):
+    python3 tests/scripts/runner.py                          # all scenarios
+    python3 tests/scripts/runner.py permissions space-modes
+"""
+
+import importlib.util
+import os
+import sys
+
+from _framework import Color, build_binary
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Scenario name -> script defining its main()
+SCENARIOS = {
+    'permissions': 'test-permissions.py',
+    'space-modes': 'test-space-modes.py',
+}
+
+def load_scenario(name):
+    """Import a scenario script (the file names aren't valid module names)"""
+    path = os.path.join(SCRIPTS_DIR, SCENARIOS[name])
+    spec = importlib.util.spec_from_file_location(f'scenario_{name.replace("-", "_")}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def main(names):
+    names = names or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"{Color.RED}Unknown scenario(s): {', '.join(unknown)}{Color.NC}")
+        print(f"Available: {', '.join(SCENARIOS)}")
+        return 2
+
+    if not build_binary():
+        return 1
+    # Built once above; the scenarios reuse it as is
+    os.environ['SKIP_BUILD'] = '1'
+
+    results = []
+    for name in names:
+        print(f"\n{Color.CYAN}▶ {name}{Color.NC}\n")
+        results.append((name, load_scenario(name).main() == 0))
+
+    print(f"\n{Color.CYAN}{'='*50}{Color.NC}")
+    for name, passed in results:
+        status = f"{Color.GREEN}✓ PASS{Color.NC}" if passed else f"{Color.RED}✗ FAIL{Color.NC}"
+        print(f"{status} - {name}")
+    return 0 if all(passed for _, passed in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -6,11 +6,16 @@ Tests: Alice creates space → creates 2 channels → Alice, Bob, Charlie join b
        Charlie CAN still decrypt channel 1 messages
 """
 
+import codecs
+import ctypes
 import subprocess
 import time
 import re
 import os
+import selectors
+import shutil
 import sys
+from collections import Counter
 
 class Color:
     GREEN = '\033[0;32m'
@@ -19,30 +24,221 @@ class Color:
     YELLOW = '\033[1;33m'
     NC = '\033[0m'
 
-def run_command(client, cmd, wait=2):
-    """Send command to client"""
-    print(f"{Color.CYAN}[{client['name']}]{Color.NC} {cmd}")
-    client['proc'].stdin.write(cmd + '\n')
+# Log patterns, compiled once at import
+_SPACE_RE = re.compile(r'Created space: .+? \(([0-9a-f]{16})\)')
+_FULL_SPACE_RE = re.compile(r'Space: ([0-9a-f]{64})')
+_INVITE_RE = re.compile(r'Created invite code: (\w+)')
+_PEER_RE = re.compile(r'Peer ID: (\w+)')
+_USER_RE = re.compile(r'User ID: ([0-9a-f]{64})')
+_THREAD_RE = re.compile(r'Created thread: .+? \(([0-9a-f]{16})\)')
+_CHAN_RE = re.compile(r'([0-9a-f]{16})\s+-\s+(general|private)')
+
+# Readiness markers: the line each command prints once it has been handled
+_PUBLISHED_RE = re.compile(r'Published \d+ KeyPackages|Failed to publish KeyPackages')
+_CONNECTED_RE = re.compile(r'Connected to peer!')
+_JOINED_RE = re.compile(r'Successfully joined Space!')
+_MEMBER_ADDED_RE = re.compile(r'added to MLS group!|Failed to add member')
+_MLS_JOINED_RE = re.compile(r'Successfully joined MLS group')
+_CHANNEL_CREATED_RE = re.compile(r'Created channel: (general|private) \(([0-9a-f]{16})\)')
+_SWITCHED_RE = re.compile(r'Switched to (?:space|channel|thread): ')
+_THREAD_SWITCHED_RE = re.compile(r'Switched to thread: ')
+_SENT_RE = re.compile(r'Message sent \(')
+_REMOVED_RE = re.compile(r'Successfully removed user|Failed to remove member')
+
+# The Channel 2 posts made after Charlie's kick, which must never reach him
+_CH2_AFTER_KICK_RE = re.compile(r'Channel 2: After kick|Channel 2: Bob after Charlie kick')
+# A message that reached a client it couldn't decrypt it for
+_REJECTED_RE = re.compile(r'Failed to decrypt (?:Channel )?MLS message|Message from future epoch')
+
+# The lines the CLI prints for each message it decrypts
+_DECRYPTED = ('Decrypted Space MLS message', 'Decrypted Channel MLS message',
+              'Decrypted queued message')
+
+# What the results section scans for, fused so each log is scanned once.
+# Message arrivals are also recorded live by wait_for; the final scan still
+# catches those that landed after their wait had given up
+_MARKERS_RE = re.compile(
+    r'Decrypted Space MLS message|Decrypted Channel MLS message|Decrypted queued message'
+    r'|Channel 1: Alice initial message|Channel 1: Bob reply'
+    r'|Channel 2: Alice initial message|Channel 2: Bob reply'
+    r'|Channel 2: After kick|Channel 2: Bob after Charlie kick'
+    r'|Channel 1: After Channel 2 kick|Channel 1: Bob after Channel 2 kick'
+    r'|Successfully removed user|MLS keys rotated'
+)
+
+def write_commands(client, cmds):
+    """Write one command, or a list of them, to the client in a single flush
+
+    Returns the log length beforehand, where the commands' output starts.
+    The CLI handles stdin one line at a time, so queued commands run in order.
+    """
+    if isinstance(cmds, str):
+        cmds = [cmds]
+    for cmd in cmds:
+        print(f"{client['prefix']} {cmd}")
+    start = len(client['tail'].read())
+    client['proc'].stdin.write(''.join(cmd + '\n' for cmd in cmds))
     client['proc'].stdin.flush()
-    time.sleep(wait)
+    return start
+
+def run_command(client, cmd, wait=2, expect=None):
+    """Send command (or a list of commands) to client
 
-def find_in_log(log_file, pattern):
-    """Find pattern in log file"""
+    Without `expect` this sleeps for `wait` seconds. With a compiled `expect`
+    pattern it returns as soon as that shows up in the client's new output,
+    waiting at most `wait`; for a list, `expect` is the last command's marker.
+    """
+    start = write_commands(client, cmd)
+    if expect is None:
+        time.sleep(wait)
+    else:
+        wait_for(client, expect, timeout=wait, start=start)
+
+def broadcast(clients, cmd, expect, timeout=10):
+    """Send the same command to several clients at once, then wait for each one's `expect` marker
+
+    The clients handle the command side by side, so the waits overlap
+    instead of adding up. `cmd` may be a list, as for run_command.
+    """
+    starts = [write_commands(client, cmd) for client in clients]
+    for client, start in zip(clients, starts):
+        wait_for(client, expect, timeout=timeout, start=start)
+
+IN_MODIFY = 0x00000002
+
+def inotify_watch(path):
+    """Return a non-blocking inotify fd that turns readable whenever `path` is written
+
+    Returns None where inotify isn't available (anything but Linux).
+    """
     try:
-        with open(log_file, 'r') as f:
-            content = f.read()
-            match = re.search(pattern, content)
-            return match.group(1) if match else None
-    except:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
         return None
+    if libc.inotify_add_watch(fd, os.fsencode(path), IN_MODIFY) < 0:
+        os.close(fd)
+        return None
+    return fd
 
-def check_log(log_file, pattern):
-    """Check if pattern exists in log"""
-    try:
-        with open(log_file, 'r') as f:
-            return bool(re.search(pattern, f.read()))
-    except:
-        return False
+class LogTail:
+    """A client's log, read incrementally from where the previous read stopped"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.buffer = ''
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.resume = {}
+        self.seen = set()
+        # Watch from the start so no write between a read and a wait is missed
+        self.watch = inotify_watch(path)
+        self.selector = None
+        if self.watch is not None:
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.watch, selectors.EVENT_READ)
+
+    def read(self):
+        """Append the bytes written since the last read and return the whole log"""
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        self.buffer += self.decoder.decode(data)
+        return self.buffer
+
+    def find(self, pattern):
+        """Return group 1 of the next match of a compiled pattern
+
+        Each pattern resumes after its previous match, so looking up the same
+        pattern twice (e.g. two created threads) yields successive matches.
+        """
+        match = pattern.search(self.read(), self.resume.get(pattern, 0))
+        if not match:
+            return None
+        self.resume[pattern] = match.end()
+        return match.group(1)
+
+    def wait(self, timeout, interval=0.05):
+        """Block until the log is written to, or at most `timeout` seconds
+
+        Without inotify this falls back to sleeping for `interval`.
+        """
+        if self.selector is None:
+            time.sleep(min(timeout, interval))
+            return
+        if self.selector.select(timeout):
+            # Drain the queued events; the next read picks up the new bytes
+            try:
+                while os.read(self.watch, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.selector is not None:
+            self.selector.close()
+            os.close(self.watch)
+            self.selector = None
+
+def wait_for(client, pattern, timeout=10, interval=0.05, start=0):
+    """Wait until `pattern` shows up in the client's log past `start`
+
+    `pattern` is a compiled regex, or a plain string matched literally;
+    literal strings that show up are recorded in the tail's `seen` set.
+    The log is re-checked whenever it is written to (polled every `interval`
+    where inotify is unavailable). Returns whether the pattern showed up
+    before `timeout` seconds passed.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        content = client['tail'].read()
+        if isinstance(pattern, str):
+            found = content.find(pattern, start) != -1
+            if found:
+                client['tail'].seen.add(pattern)
+        else:
+            found = pattern.search(content, start) is not None
+        remaining = deadline - time.monotonic()
+        if found or remaining <= 0:
+            return found
+        client['tail'].wait(remaining, interval)
+
+def assert_not_seen(client, pattern, start, rejections, within=5.0):
+    """Return True if `pattern` stays out of the client's log past `start`
+
+    Returns False as soon as it shows up, so a regression fails fast, and
+    True once the client has rejected `rejections` messages since `start`
+    (it got them and couldn't read them) or `within` seconds pass.
+    """
+    deadline = time.monotonic() + within
+    while True:
+        content = client['tail'].read()
+        if pattern.search(content, start):
+            return False
+        remaining = deadline - time.monotonic()
+        if len(_REJECTED_RE.findall(content, start)) >= rejections or remaining <= 0:
+            return True
+        client['tail'].wait(remaining)
+
+def post_messages(posts, receivers, timeout=10):
+    """Send each (sender, message) pair in turn, then wait for them all to arrive
+
+    Every message is waited for at each receiver other than its sender,
+    against one shared deadline, so the propagation waits overlap; only
+    output from after the sends is searched.
+    """
+    starts = {receiver['name']: len(receiver['tail'].read()) for receiver in receivers}
+    for sender, message in posts:
+        run_command(sender, f'send {message}', wait=4, expect=_SENT_RE)
+    deadline = time.monotonic() + timeout
+    for sender, message in posts:
+        for receiver in receivers:
+            if receiver is not sender:
+                wait_for(receiver, message, timeout=max(deadline - time.monotonic(), 0),
+                         start=starts[receiver['name']])
 
 def main():
     print(f"{Color.CYAN}╔═══════════════════════════════════════════════╗{Color.NC}")
@@ -51,28 +247,31 @@ def main():
     
     # Setup test directory structure
     test_dir = 'tests/test-runs/channel-kick'
-    os.makedirs(test_dir, exist_ok=True)
     
     # Cleanup old test artifacts
-    os.system(f'rm -rf {test_dir}/* 2>/dev/null')
+    shutil.rmtree(test_dir, ignore_errors=True)
+    os.makedirs(test_dir, exist_ok=True)
     
     # Build (use debug build since it's faster and we already have it)
     binary_path = './target/debug/spaceway'
     
-    # Check if binary exists
-    if not os.path.exists(binary_path):
-        print(f"{Color.CYAN}Building debug version (this may take a while)...{Color.NC}")
-        build_result = subprocess.run(
-            ['cargo', '+nightly', 'build'],
-            capture_output=True,
-            text=True
-        )
-        
-        if build_result.returncode != 0:
-            print(f"{Color.RED}Build failed!{Color.NC}")
-            print(build_result.stderr[-500:] if len(build_result.stderr) > 500 else build_result.stderr)
-            return 1
-        
+    # Always ask cargo: it is a no-op when the binary is fresh, and a stale
+    # binary gets rebuilt instead of silently tested. Only stderr is kept,
+    # in short form, for the failure message and the "Compiling" check.
+    print(f"{Color.CYAN}Checking debug build...{Color.NC}")
+    build_result = subprocess.run(
+        ['cargo', '+nightly', 'build', '--message-format=short'],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    
+    if build_result.returncode != 0 or not os.path.isfile(binary_path):
+        print(f"{Color.RED}Build failed!{Color.NC}")
+        print(build_result.stderr[-500:] if len(build_result.stderr) > 500 else build_result.stderr)
+        return 1
+    
+    if 'Compiling' in build_result.stderr:
         print(f"{Color.GREEN}✓ Build completed{Color.NC}")
     else:
         print(f"{Color.GREEN}✓ Using existing binary{Color.NC}")
@@ -84,116 +283,129 @@ def main():
     
     print(f"{Color.CYAN}Starting Alice, Bob, and Charlie...{Color.NC}")
     
+    # stdout goes straight to the log files, so stdin is the only pipe and
+    # bufsize governs its write side; run_command flushes after every line
     alice = {
         'name': 'Alice',
+        'prefix': f"{Color.CYAN}[Alice]{Color.NC}",
         'proc': subprocess.Popen(
             [binary_path, '--account', f'{test_dir}/alice.key', '--port', '9001'],
-            stdin=subprocess.PIPE, stdout=alice_log, stderr=subprocess.STDOUT, text=True, bufsize=1
+            stdin=subprocess.PIPE, stdout=alice_log, stderr=subprocess.STDOUT, text=True, bufsize=4096
         ),
-        'log': f'{test_dir}/alice.log'
+        'log': f'{test_dir}/alice.log',
+        'tail': LogTail(f'{test_dir}/alice.log')
     }
     
     bob = {
         'name': 'Bob',
+        'prefix': f"{Color.CYAN}[Bob]{Color.NC}",
         'proc': subprocess.Popen(
             [binary_path, '--account', f'{test_dir}/bob.key', '--port', '9002'],
-            stdin=subprocess.PIPE, stdout=bob_log, stderr=subprocess.STDOUT, text=True, bufsize=1
+            stdin=subprocess.PIPE, stdout=bob_log, stderr=subprocess.STDOUT, text=True, bufsize=4096
         ),
-        'log': f'{test_dir}/bob.log'
+        'log': f'{test_dir}/bob.log',
+        'tail': LogTail(f'{test_dir}/bob.log')
     }
     
     charlie = {
         'name': 'Charlie',
+        'prefix': f"{Color.CYAN}[Charlie]{Color.NC}",
         'proc': subprocess.Popen(
             [binary_path, '--account', f'{test_dir}/charlie.key', '--port', '9003'],
-            stdin=subprocess.PIPE, stdout=charlie_log, stderr=subprocess.STDOUT, text=True, bufsize=1
+            stdin=subprocess.PIPE, stdout=charlie_log, stderr=subprocess.STDOUT, text=True, bufsize=4096
         ),
-        'log': f'{test_dir}/charlie.log'
+        'log': f'{test_dir}/charlie.log',
+        'tail': LogTail(f'{test_dir}/charlie.log')
     }
     
+    # Pin each client to its own CPU so the MLS crypto phases don't migrate
+    # between cores; the first CPU stays free for this driver. Linux only,
+    # and skipped when there aren't enough CPUs to go round.
+    if hasattr(os, 'sched_setaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+        if len(cpus) >= 4:
+            for cpu, client in zip(cpus[1:], [alice, bob, charlie]):
+                try:
+                    os.sched_setaffinity(client['proc'].pid, {cpu})
+                except OSError:
+                    pass  # Client already exited; startup will report it
+    
     try:
+        for client, port in [(alice, 9001), (bob, 9002), (charlie, 9003)]:
+            wait_for(client, re.compile(rf'Listening on /ip4/[0-9.]+/tcp/{port}\b'))
         print(f"{Color.GREEN}✓ Alice, Bob, and Charlie started{Color.NC}\n")
-        time.sleep(3)
         
         # Setup
         print(f"{Color.CYAN}Setting up KeyPackages and Space...{Color.NC}")
-        run_command(alice, 'keypackage publish', wait=5)
-        run_command(bob, 'keypackage publish', wait=5)
-        run_command(charlie, 'keypackage publish', wait=5)
+        broadcast([alice, bob, charlie], 'keypackage publish', _PUBLISHED_RE)
         
-        run_command(alice, 'space create channel-kick-test', wait=3)
-        space_id = find_in_log(alice['log'], r'Created space: .+? \(([0-9a-f]{16})\)')
+        run_command(alice, 'space create channel-kick-test', wait=3, expect=_SPACE_RE)
+        space_id = alice['tail'].find(_SPACE_RE)
         if not space_id:
             print(f"{Color.RED}✗ Failed to create space{Color.NC}")
             return 1
         
-        run_command(alice, 'context', wait=2)
-        full_space_id = find_in_log(alice['log'], r'Space: ([0-9a-f]{64})')
+        run_command(alice, 'context', wait=2, expect=_FULL_SPACE_RE)
+        full_space_id = alice['tail'].find(_FULL_SPACE_RE)
         
-        run_command(alice, 'invite create', wait=3)
-        invite = find_in_log(alice['log'], r'Created invite code: (\w+)')
+        run_command(alice, 'invite create', wait=3, expect=_INVITE_RE)
+        invite = alice['tail'].find(_INVITE_RE)
         
-        run_command(alice, 'network', wait=2)
-        peer_id = find_in_log(alice['log'], r'Peer ID: (\w+)')
+        run_command(alice, 'network', wait=2, expect=_PEER_RE)
+        peer_id = alice['tail'].find(_PEER_RE)
         
         print(f"{Color.GREEN}✓ Setup complete{Color.NC}\n")
         
         # Bob joins
         print(f"{Color.CYAN}Bob connecting and joining...{Color.NC}")
-        run_command(bob, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3)
-        run_command(bob, f'join {full_space_id} {invite}', wait=5)
+        run_command(bob, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3, expect=_CONNECTED_RE)
+        run_command(bob, f'join {full_space_id} {invite}', wait=5, expect=_JOINED_RE)
         
-        run_command(bob, 'whoami', wait=2)
-        bob_id = find_in_log(bob['log'], r'User ID: ([0-9a-f]{64})')
+        run_command(bob, 'whoami', wait=2, expect=_USER_RE)
+        bob_id = bob['tail'].find(_USER_RE)
         
         print(f"{Color.GREEN}✓ Bob joined{Color.NC}\n")
         
         # Charlie joins
         print(f"{Color.CYAN}Charlie connecting and joining...{Color.NC}")
-        run_command(charlie, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3)
-        run_command(charlie, f'join {full_space_id} {invite}', wait=5)
+        run_command(charlie, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3, expect=_CONNECTED_RE)
+        run_command(charlie, f'join {full_space_id} {invite}', wait=5, expect=_JOINED_RE)
         
-        run_command(charlie, 'whoami', wait=2)
-        charlie_id = find_in_log(charlie['log'], r'User ID: ([0-9a-f]{64})')
+        run_command(charlie, 'whoami', wait=2, expect=_USER_RE)
+        charlie_id = charlie['tail'].find(_USER_RE)
         
         print(f"{Color.GREEN}✓ Charlie joined{Color.NC}\n")
         
         # Add members to space MLS
         print(f"{Color.CYAN}Adding Bob to space MLS group...{Color.NC}")
-        run_command(alice, f'member add {bob_id}', wait=5)
-        time.sleep(4)
+        run_command(alice, f'member add {bob_id}', wait=5, expect=_MEMBER_ADDED_RE)
+        wait_for(bob, _MLS_JOINED_RE, timeout=4)  # Wait for Welcome message
         print(f"{Color.GREEN}✓ Bob added to space MLS{Color.NC}\n")
         
         print(f"{Color.CYAN}Adding Charlie to space MLS group...{Color.NC}")
-        run_command(alice, f'member add {charlie_id}', wait=5)
-        time.sleep(4)
+        run_command(alice, f'member add {charlie_id}', wait=5, expect=_MEMBER_ADDED_RE)
+        wait_for(charlie, _MLS_JOINED_RE, timeout=4)  # Wait for Welcome message
         print(f"{Color.GREEN}✓ Charlie added to space MLS{Color.NC}\n")
         
         # Alice creates two channels
         print(f"{Color.CYAN}Alice creating two channels...{Color.NC}")
-        run_command(alice, 'channel create general', wait=3)
-        run_command(alice, 'channel create private', wait=3)
+        run_command(alice, 'channel create general', wait=3, expect=_CHANNEL_CREATED_RE)
+        run_command(alice, 'channel create private', wait=3, expect=_CHANNEL_CREATED_RE)
         
-        # Get channel IDs
-        run_command(alice, 'channels', wait=2)
-        alice_log_content = open(alice['log']).read()
-        channel1_id = re.search(r'([0-9a-f]{16})\s+-\s+general', alice_log_content)
-        channel2_id = re.search(r'([0-9a-f]{16})\s+-\s+private', alice_log_content)
+        # The create confirmations already carry the IDs, so no listing is needed
+        id_by_name = dict(_CHANNEL_CREATED_RE.findall(alice['tail'].read()))
+        channel1_id = id_by_name.get('general')
+        channel2_id = id_by_name.get('private')
         
         if not channel1_id or not channel2_id:
             print(f"{Color.RED}✗ Failed to find channel IDs{Color.NC}")
             return 1
         
-        channel1_id = channel1_id.group(1)
-        channel2_id = channel2_id.group(1)
-        
         print(f"{Color.GREEN}✓ Created channels: general ({channel1_id}), private ({channel2_id}){Color.NC}\n")
         
         # Bob and Charlie navigate to both channels
         print(f"{Color.CYAN}Bob and Charlie joining both channels...{Color.NC}")
-        for client in [bob, charlie]:
-            run_command(client, f'space {space_id}', wait=2)
-            run_command(client, 'channels', wait=2)
+        broadcast([bob, charlie], [f'space {space_id}', 'channels'], _CHAN_RE, timeout=6)
         
         print(f"{Color.GREEN}✓ All members can see both channels{Color.NC}\n")
         
@@ -201,14 +413,14 @@ def main():
         print(f"{Color.CYAN}Alice creating threads in both channels...{Color.NC}")
         
         # Channel 1 thread
-        run_command(alice, f'channel {channel1_id}', wait=2)
-        run_command(alice, 'thread create "General Discussion"', wait=3)
-        thread1_id = find_in_log(alice['log'], r'Created thread: .+? \(([0-9a-f]{16})\)')
+        run_command(alice, f'channel {channel1_id}', wait=2, expect=_SWITCHED_RE)
+        run_command(alice, 'thread create "General Discussion"', wait=3, expect=_THREAD_RE)
+        thread1_id = alice['tail'].find(_THREAD_RE)
         
         # Channel 2 thread
-        run_command(alice, f'channel {channel2_id}', wait=2)
-        run_command(alice, 'thread create "Private Discussion"', wait=3)
-        thread2_id = find_in_log(alice['log'], r'Created thread: .+? \(([0-9a-f]{16})\)')
+        run_command(alice, f'channel {channel2_id}', wait=2, expect=_SWITCHED_RE)
+        run_command(alice, 'thread create "Private Discussion"', wait=3, expect=_THREAD_RE)
+        thread2_id = alice['tail'].find(_THREAD_RE)
         
         print(f"{Color.GREEN}✓ Threads created{Color.NC}\n")
         
@@ -216,42 +428,29 @@ def main():
         print(f"{Color.CYAN}=== Testing Channel 1 (general) ==={Color.NC}\n")
         
         # Navigate all to channel 1 thread
-        for client in [alice, bob, charlie]:
-            run_command(client, f'space {space_id}', wait=2)
-            run_command(client, f'channel {channel1_id}', wait=2)
-            run_command(client, f'thread {thread1_id}', wait=2)
+        broadcast([alice, bob, charlie], [f'space {space_id}', f'channel {channel1_id}', f'thread {thread1_id}'],
+                  _THREAD_SWITCHED_RE, timeout=6)
         
-        print(f"{Color.CYAN}Alice posting to Channel 1...{Color.NC}")
-        run_command(alice, 'send Channel 1: Alice initial message', wait=4)
-        time.sleep(5)
-        
-        print(f"{Color.CYAN}Bob posting to Channel 1...{Color.NC}")
-        run_command(bob, 'send Channel 1: Bob reply', wait=4)
-        time.sleep(4)
-        
-        print(f"{Color.CYAN}Charlie posting to Channel 1...{Color.NC}")
-        run_command(charlie, 'send Channel 1: Charlie reply', wait=4)
-        time.sleep(4)
+        print(f"{Color.CYAN}Alice, Bob, and Charlie posting to Channel 1...{Color.NC}")
+        post_messages([
+            (alice, 'Channel 1: Alice initial message'),
+            (bob, 'Channel 1: Bob reply'),
+            (charlie, 'Channel 1: Charlie reply')
+        ], [alice, bob, charlie])
         
         # All members post in Channel 2
         print(f"\n{Color.CYAN}=== Testing Channel 2 (private) ==={Color.NC}\n")
         
         # Navigate all to channel 2 thread
-        for client in [alice, bob, charlie]:
-            run_command(client, f'channel {channel2_id}', wait=2)
-            run_command(client, f'thread {thread2_id}', wait=2)
-        
-        print(f"{Color.CYAN}Alice posting to Channel 2...{Color.NC}")
-        run_command(alice, 'send Channel 2: Alice initial message', wait=4)
-        time.sleep(5)
+        broadcast([alice, bob, charlie], [f'channel {channel2_id}', f'thread {thread2_id}'],
+                  _THREAD_SWITCHED_RE, timeout=6)
         
-        print(f"{Color.CYAN}Bob posting to Channel 2...{Color.NC}")
-        run_command(bob, 'send Channel 2: Bob reply', wait=4)
-        time.sleep(4)
-        
-        print(f"{Color.CYAN}Charlie posting to Channel 2...{Color.NC}")
-        run_command(charlie, 'send Channel 2: Charlie reply', wait=4)
-        time.sleep(4)
+        print(f"{Color.CYAN}Alice, Bob, and Charlie posting to Channel 2...{Color.NC}")
+        post_messages([
+            (alice, 'Channel 2: Alice initial message'),
+            (bob, 'Channel 2: Bob reply'),
+            (charlie, 'Channel 2: Charlie reply')
+        ], [alice, bob, charlie])
         
         # === KICK CHARLIE FROM CHANNEL 2 ===
         print(f"\n{Color.CYAN}{'='*50}{Color.NC}")
@@ -259,85 +458,92 @@ def main():
         print(f"{Color.CYAN}{'='*50}{Color.NC}\n")
         
         # Alice navigates to channel 2 and kicks Charlie
-        run_command(alice, f'channel {channel2_id}', wait=2)
-        run_command(alice, f'kick {charlie_id}', wait=7)
+        run_command(alice, f'channel {channel2_id}', wait=2, expect=_SWITCHED_RE)
+        run_command(alice, f'kick {charlie_id}', wait=7, expect=_REMOVED_RE)
         
         print(f"{Color.GREEN}✓ Charlie has been kicked from Channel 2{Color.NC}\n")
         
         # Post to Channel 2 after kick
         print(f"{Color.CYAN}Alice and Bob posting to Channel 2 after kick...{Color.NC}")
-        run_command(alice, f'thread {thread2_id}', wait=2)
-        run_command(alice, 'send Channel 2: After kick - Charlie should NOT see this', wait=4)
-        time.sleep(5)
-        
-        # Bob posts to channel 2
-        run_command(bob, f'channel {channel2_id}', wait=2)
-        run_command(bob, f'thread {thread2_id}', wait=2)
-        run_command(bob, 'send Channel 2: Bob after Charlie kick', wait=4)
-        time.sleep(5)
+        run_command(alice, f'thread {thread2_id}', wait=2, expect=_SWITCHED_RE)
+        run_command(bob, [f'channel {channel2_id}', f'thread {thread2_id}'], wait=3, expect=_THREAD_SWITCHED_RE)
+        charlie_start = len(charlie['tail'].read())
+        post_messages([
+            (alice, 'Channel 2: After kick - Charlie should NOT see this'),
+            (bob, 'Channel 2: Bob after Charlie kick')
+        ], [alice, bob])
+        
+        # Security-critical: stop right away if either post reaches Charlie;
+        # once he has rejected both, there is nothing left to wait for
+        if not assert_not_seen(charlie, _CH2_AFTER_KICK_RE, charlie_start, rejections=2, within=5.0):
+            print(f"\n{Color.RED}✗{Color.NC} Charlie decrypted a Channel 2 message after kick (SECURITY ISSUE!)")
+            print(f"\n{Color.RED}❌ TEST FAILED{Color.NC}")
+            print(f"Check logs in: {test_dir}/")
+            return 1
         
         # Post to Channel 1 after kick (Charlie should still see)
         print(f"\n{Color.CYAN}Alice and Bob posting to Channel 1 after Channel 2 kick...{Color.NC}")
         
         # Navigate to channel 1
-        run_command(alice, f'channel {channel1_id}', wait=2)
-        run_command(alice, f'thread {thread1_id}', wait=2)
-        run_command(alice, 'send Channel 1: After Channel 2 kick - Charlie SHOULD see this', wait=4)
-        time.sleep(5)
-        
-        run_command(bob, f'channel {channel1_id}', wait=2)
-        run_command(bob, f'thread {thread1_id}', wait=2)
-        run_command(bob, 'send Channel 1: Bob after Channel 2 kick', wait=4)
-        time.sleep(5)
+        broadcast([alice, bob], [f'channel {channel1_id}', f'thread {thread1_id}'], _THREAD_SWITCHED_RE, timeout=6)
+        post_messages([
+            (alice, 'Channel 1: After Channel 2 kick - Charlie SHOULD see this'),
+            (bob, 'Channel 1: Bob after Channel 2 kick')
+        ], [alice, bob, charlie])
         
         # Charlie tries to view both channels
         print(f"\n{Color.CYAN}Charlie checking messages in both channels...{Color.NC}")
-        run_command(charlie, f'channel {channel2_id}', wait=2)
-        run_command(charlie, f'thread {thread2_id}', wait=2)
-        time.sleep(3)
+        run_command(charlie, [f'channel {channel2_id}', f'thread {thread2_id}'], wait=3, expect=_THREAD_SWITCHED_RE)
         
-        run_command(charlie, f'channel {channel1_id}', wait=2)
-        run_command(charlie, f'thread {thread1_id}', wait=2)
-        time.sleep(3)
-        
-        # Close logs
-        alice_log.close()
-        bob_log.close()
-        charlie_log.close()
+        run_command(charlie, [f'channel {channel1_id}', f'thread {thread1_id}'], wait=3, expect=_THREAD_SWITCHED_RE)
         
         # Check results
         print(f"\n{Color.CYAN}{'='*50}{Color.NC}")
         print(f"{Color.CYAN}Results{Color.NC}")
         print(f"{Color.CYAN}{'='*50}{Color.NC}\n")
         
-        alice_log_content = open(alice['log']).read()
-        bob_log_content = open(bob['log']).read()
-        charlie_log_content = open(charlie['log']).read()
+        # One pass per log counts every marker
+        alice_found = Counter(match.group(0) for match in _MARKERS_RE.finditer(alice['tail'].read()))
+        bob_found = Counter(match.group(0) for match in _MARKERS_RE.finditer(bob['tail'].read()))
+        charlie_found = Counter(match.group(0) for match in _MARKERS_RE.finditer(charlie['tail'].read()))
         
         # Count total decryptions
-        alice_decrypts = len(re.findall(r'Decrypted MLS message', alice_log_content))
-        bob_decrypts = len(re.findall(r'Decrypted MLS message', bob_log_content))
-        charlie_decrypts = len(re.findall(r'Decrypted MLS message', charlie_log_content))
+        alice_decrypts = sum(alice_found[line] for line in _DECRYPTED)
+        bob_decrypts = sum(bob_found[line] for line in _DECRYPTED)
+        charlie_decrypts = sum(charlie_found[line] for line in _DECRYPTED)
+        
+        # Message arrivals were recorded live while the posts propagated; the
+        # final scan above counts the ones that arrived after their wait
+        charlie_seen = charlie['tail'].seen
+        bob_seen = bob['tail'].seen
         
         # Check Channel 1 messages (before kick)
-        charlie_got_ch1_alice_initial = 'Channel 1: Alice initial message' in charlie_log_content
-        charlie_got_ch1_bob = 'Channel 1: Bob reply' in charlie_log_content
+        charlie_got_ch1_alice_initial = ('Channel 1: Alice initial message' in charlie_seen
+                                         or 'Channel 1: Alice initial message' in charlie_found)
+        charlie_got_ch1_bob = ('Channel 1: Bob reply' in charlie_seen
+                               or 'Channel 1: Bob reply' in charlie_found)
         
         # Check Channel 2 messages (before kick)
-        charlie_got_ch2_alice_initial = 'Channel 2: Alice initial message' in charlie_log_content
-        charlie_got_ch2_bob = 'Channel 2: Bob reply' in charlie_log_content
+        charlie_got_ch2_alice_initial = ('Channel 2: Alice initial message' in charlie_seen
+                                         or 'Channel 2: Alice initial message' in charlie_found)
+        charlie_got_ch2_bob = ('Channel 2: Bob reply' in charlie_seen
+                               or 'Channel 2: Bob reply' in charlie_found)
         
         # Check Channel 2 messages (after kick) - Charlie should NOT see these
-        charlie_got_ch2_after_kick_alice = 'Channel 2: After kick' in charlie_log_content
-        charlie_got_ch2_after_kick_bob = 'Channel 2: Bob after Charlie kick' in charlie_log_content
+        charlie_got_ch2_after_kick_alice = 'Channel 2: After kick' in charlie_found
+        charlie_got_ch2_after_kick_bob = 'Channel 2: Bob after Charlie kick' in charlie_found
         
         # Check Channel 1 messages (after Channel 2 kick) - Charlie SHOULD see these
-        charlie_got_ch1_after_kick_alice = 'Channel 1: After Channel 2 kick' in charlie_log_content
-        charlie_got_ch1_after_kick_bob = 'Channel 1: Bob after Channel 2 kick' in charlie_log_content
+        charlie_got_ch1_after_kick_alice = ('Channel 1: After Channel 2 kick - Charlie SHOULD see this' in charlie_seen
+                                            or 'Channel 1: After Channel 2 kick' in charlie_found)
+        charlie_got_ch1_after_kick_bob = ('Channel 1: Bob after Channel 2 kick' in charlie_seen
+                                          or 'Channel 1: Bob after Channel 2 kick' in charlie_found)
         
         # Bob should see everything
-        bob_got_ch2_after_kick = 'Channel 2: After kick' in bob_log_content
-        bob_got_ch1_after_kick = 'Channel 1: After Channel 2 kick' in bob_log_content
+        bob_got_ch2_after_kick = ('Channel 2: After kick - Charlie should NOT see this' in bob_seen
+                                  or 'Channel 2: After kick' in bob_found)
+        bob_got_ch1_after_kick = ('Channel 1: After Channel 2 kick - Charlie SHOULD see this' in bob_seen
+                                  or 'Channel 1: After Channel 2 kick' in bob_found)
         
         print(f"  Total decryptions:")
         print(f"    Alice: {alice_decrypts}")
@@ -420,7 +626,7 @@ def main():
             print(f"{Color.RED}✗{Color.NC} Bob can't decrypt Channel 1 messages")
         
         # Test 9: Kick command succeeded
-        if 'Successfully removed user' in alice_log_content or 'MLS keys rotated' in alice_log_content:
+        if 'Successfully removed user' in alice_found or 'MLS keys rotated' in alice_found:
             print(f"{Color.GREEN}✓{Color.NC} Channel kick command succeeded")
             tests_passed += 1
         else:
@@ -450,17 +656,25 @@ def main():
             return 1
             
     finally:
-        alice['proc'].terminate()
-        bob['proc'].terminate()
-        charlie['proc'].terminate()
-        try:
-            alice['proc'].wait(timeout=3)
-            bob['proc'].wait(timeout=3)
-            charlie['proc'].wait(timeout=3)
-        except:
-            alice['proc'].kill()
-            bob['proc'].kill()
-            charlie['proc'].kill()
+        # Signal every client before waiting on any, so they shut down side
+        # by side; the waits share one 3s deadline
+        clients = [alice, bob, charlie]
+        for client in clients:
+            client['proc'].terminate()
+        deadline = time.monotonic() + 3
+        for client in clients:
+            try:
+                client['proc'].wait(timeout=max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                client['proc'].kill()
+                client['proc'].wait()
+        # The children hold their own copies of these; closing ours on every
+        # exit path, early returns included, keeps the handles from leaking
+        alice_log.close()
+        bob_log.close()
+        charlie_log.close()
+        for client in clients:
+            client['tail'].close()
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -5,11 +5,14 @@ Tests: Alice creates space → invites Bob, Charlie, and Dave → all exchange m
        Alice kicks Bob → Alice sends message → Bob CANNOT decrypt, Charlie and Dave CAN decrypt
 """
 
+import mmap
 import subprocess
 import time
 import re
 import os
+import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 class Color:
     GREEN = '\033[0;32m'
@@ -18,58 +21,227 @@ class Color:
     YELLOW = '\033[1;33m'
     NC = '\033[0m'
 
-def run_command(client, cmd, wait=2):
-    """Send command to client"""
+# Log patterns, compiled once at import; the capturing ones also tell
+# run_command that the command producing them has been handled
+SPACE_ID_RE = re.compile(rb'Created space: .+? \(([0-9a-f]{16})\)')
+FULL_SPACE_RE = re.compile(rb'Space: ([0-9a-f]{64})')
+INVITE_RE = re.compile(rb'Created invite code: (\w+)')
+PEER_RE = re.compile(rb'Peer ID: (\w+)')
+USER_RE = re.compile(rb'User ID: ([0-9a-f]{64})')
+CHANNEL_RE = re.compile(rb'([0-9a-f]{16})\s+-\s+general')
+THREAD_RE = re.compile(rb'([0-9a-f]{16})\s+-\s+"?Kick Test"?')
+
+# Readiness markers: the line each command prints once it has been handled
+LISTENING_RE = re.compile(rb'Listening on /ip4/')
+KP_PUBLISHED_RE = re.compile(rb'Published \d+ KeyPackages|Failed to publish KeyPackages')
+CONNECTED_RE = re.compile(rb'Connected to peer!')
+JOINED_RE = re.compile(rb'Successfully joined Space!')
+MEMBER_ADDED_RE = re.compile(rb'added to MLS group!|Failed to add member')
+MLS_JOINED_RE = re.compile(rb'Successfully joined MLS group')
+CREATED_CHANNEL_RE = re.compile(rb'Created channel: ')
+CREATED_THREAD_RE = re.compile(rb'Created thread: ')
+SWITCHED_RE = re.compile(rb'Switched to (?:space|channel|thread): ')
+SENT_RE = re.compile(rb'Message sent \(')
+REMOVED_RE = re.compile(rb'Successfully removed user|Failed to remove member')
+
+# Message arrivals the propagation waits look for
+BEFORE_KICK_RE = re.compile(rb'Before kick')
+REPLIES = [b'Bob reply before kick', b'Charlie reply before kick', b'Dave reply before kick']
+AFTER_KICK_RE = re.compile(rb'After kick')
+# Any sign the kicked client got a message, whether it could read it or not
+REACTED_RE = re.compile(rb'Decrypted (?:Space MLS|Channel MLS|queued) message'
+                        rb'|Failed to decrypt MLS message|Message from future epoch')
+
+# The lines the CLI prints for each message it decrypts
+DECRYPTED = (b'Decrypted Space MLS message', b'Decrypted Channel MLS message',
+             b'Decrypted queued message')
+
+# Literals the results section counts, fused so each log is scanned once
+RESULT_NEEDLES = DECRYPTED + (
+    b'Before kick', b'Bob reply before kick',
+    b'Charlie reply before kick', b'Dave reply before kick', b'After kick',
+    b'Successfully removed user', b'MLS keys rotated',
+)
+RESULT_RE = re.compile(b'|'.join(map(re.escape, RESULT_NEEDLES)))
+
+def log_size(client):
+    """Current length of the client's log, where new output will start"""
+    try:
+        return os.path.getsize(client['log'])
+    except OSError:
+        return 0
+
+# Bytes before the end of the previous poll that the next one searches
+# again, so a match straddling two reads is still found; longer than any
+# line the waits look for
+OVERLAP = 256
+
+def wait_for(client, expect, timeout=10, poll=0.05, start=0):
+    """Poll the client's log from `start` until `expect` matches or `timeout` passes
+
+    Each poll reads only what the log gained and searches from just before
+    where the previous poll stopped. Returns the match, or None if it never
+    showed up.
+    """
+    deadline = time.monotonic() + timeout
+    pos = start
+    while True:
+        buf = read_log(client)
+        match = expect.search(buf, pos)
+        if match or time.monotonic() >= deadline:
+            return match
+        pos = max(start, len(buf) - OVERLAP)
+        time.sleep(poll)
+
+def wait_for_all(client, needles, timeout=15, poll=0.05, start=0):
+    """Poll the client's log from `start` until every literal in `needles` has appeared
+
+    Needles already found are not searched for again. Returns True if they
+    all showed up before `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    missing = list(needles)
+    pos = start
+    while True:
+        buf = read_log(client)
+        missing = [needle for needle in missing if buf.find(needle, pos) == -1]
+        if not missing:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        pos = max(start, len(buf) - OVERLAP)
+        time.sleep(poll)
+
+def spawn_client(name, port, test_dir, binary):
+    """Start one client with its output going to <test_dir>/<name>.log"""
+    log_path = f'{test_dir}/{name.lower()}.log'
+    fh = open(log_path, 'wb', buffering=0)
+    proc = subprocess.Popen(
+        [binary, '--account', f'{test_dir}/{name.lower()}.key', '--port', str(port)],
+        stdin=subprocess.PIPE, stdout=fh, stderr=subprocess.STDOUT, bufsize=0
+    )
+    return {
+        'name': name,
+        'proc': proc,
+        'log': log_path,
+        'log_fh': fh,
+        'offset': 0,
+        'buf': bytearray(),
+        'found': {}
+    }
+
+def run_command(client, cmd, expect=None, timeout=10, poll=0.05):
+    """Send command to client
+
+    With a compiled `expect` pattern, returns once it appears in the output the
+    command produced, or after `timeout` seconds; otherwise just a short floor sleep.
+    """
     print(f"{Color.CYAN}[{client['name']}]{Color.NC} {cmd}")
-    client['proc'].stdin.write(cmd + '\n')
-    client['proc'].stdin.flush()
-    time.sleep(wait)
+    start = log_size(client)
+    client['proc'].stdin.write((cmd + '\n').encode('ascii'))  # unbuffered: goes straight to the pipe
+    time.sleep(poll)
+    if expect is not None:
+        return wait_for(client, expect, timeout, poll, start)
 
-def find_in_log(log_file, pattern):
-    """Find pattern in log file"""
+def read_log(client):
+    """Return the client's raw log so far, reading only what was appended since the last call
+
+    The buffer grows in place, so the waits' polls don't copy what was read before.
+    """
     try:
-        with open(log_file, 'r') as f:
-            content = f.read()
-            match = re.search(pattern, content)
-            return match.group(1) if match else None
-    except:
-        return None
+        with open(client['log'], 'rb') as f:
+            f.seek(client['offset'])
+            data = f.read()
+    except OSError:
+        return client['buf']
+    client['offset'] += len(data)
+    client['buf'] += data
+    return client['buf']
+
+def find_in_log(client, pattern, key):
+    """Find a compiled bytes pattern in the client's log, caching the captured group under `key`
+
+    Only the captured group is decoded, once, when it is first found.
+    """
+    found = client['found'].get(key)
+    if found is None:
+        match = pattern.search(read_log(client))
+        found = match.group(1).decode('ascii') if match else None
+        if found is not None:
+            client['found'][key] = found
+    return found
 
-def check_log(log_file, pattern):
-    """Check if pattern exists in log"""
+def find_shared(client, shared, key, listing, pattern):
+    """Return the space-wide ID cached in `shared` under `key`
+
+    On a miss, run the `listing` command on this client, capture the ID with
+    `pattern` and cache it, so later members can skip the listing entirely.
+    """
+    found = shared.get(key)
+    if found is None:
+        run_command(client, listing, expect=pattern)
+        found = find_in_log(client, pattern, f'{key[0]}_id')
+        if found is not None:
+            shared[key] = found
+    return found
+
+def join_space(client, peer_id, full_space_id, invite):
+    """Connect the client to Alice, join the space and return its user ID"""
+    run_command(client, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', expect=CONNECTED_RE)
+    run_command(client, f'join {full_space_id} {invite}', expect=JOINED_RE, timeout=16)
+    run_command(client, 'whoami', expect=USER_RE)
+    return find_in_log(client, USER_RE, 'user_id')
+
+def load_log(path):
+    """Map a finished log read-only; an empty log (which mmap refuses) is b''"""
+    fd = os.open(path, os.O_RDONLY)
     try:
-        with open(log_file, 'r') as f:
-            return bool(re.search(pattern, f.read()))
-    except:
-        return False
+        size = os.fstat(fd).st_size
+        return mmap.mmap(fd, size, access=mmap.ACCESS_READ) if size else b''
+    finally:
+        os.close(fd)
+
+def tally(log):
+    """Count each of RESULT_NEEDLES in a single pass over the log"""
+    counts = dict.fromkeys(RESULT_NEEDLES, 0)
+    for match in RESULT_RE.finditer(log):
+        counts[match.group()] += 1
+    return counts
+
+def check_log(client, pattern):
+    """Check if a compiled pattern exists in the client's log"""
+    return bool(pattern.search(read_log(client)))
 
 def main():
     print(f"{Color.CYAN}╔═══════════════════════════════════════════════╗{Color.NC}")
     print(f"{Color.CYAN}║  MLS Four Members + Kick Test                 ║{Color.NC}")
     print(f"{Color.CYAN}╚═══════════════════════════════════════════════╝{Color.NC}\n")
     
-    # Setup test directory structure
+    # Setup test directory structure, clearing old test artifacts
     test_dir = 'tests/test-runs/four-members-kick'
+    shutil.rmtree(test_dir, ignore_errors=True)
     os.makedirs(test_dir, exist_ok=True)
     
-    # Cleanup old test artifacts
-    os.system(f'rm -rf {test_dir}/* 2>/dev/null')
-    
     # Build (use debug build since it's faster and we already have it)
     binary_path = './target/debug/spaceway'
     
     # Check if binary exists
     if not os.path.exists(binary_path):
         print(f"{Color.CYAN}Building debug version (this may take a while)...{Color.NC}")
-        build_result = subprocess.run(
-            ['cargo', '+nightly', 'build'],
-            capture_output=True,
-            text=True
-        )
-        
-        if build_result.returncode != 0:
+        # Stream the build output to a file rather than buffering it all in memory
+        build_log = f'{test_dir}/build.log'
+        with open(build_log, 'wb') as bl:
+            returncode = subprocess.run(
+                ['cargo', '+nightly', 'build'],
+                stdout=bl,
+                stderr=subprocess.STDOUT
+            ).returncode
+        
+        if returncode != 0:
             print(f"{Color.RED}Build failed!{Color.NC}")
-            print(build_result.stderr[-500:] if len(build_result.stderr) > 500 else build_result.stderr)
+            with open(build_log, 'rb') as f:
+                f.seek(max(0, os.fstat(f.fileno()).st_size - 500))
+                print(f.read().decode(errors='replace'))
             return 1
         
         print(f"{Color.GREEN}✓ Build completed{Color.NC}")
@@ -77,202 +249,145 @@ def main():
         print(f"{Color.GREEN}✓ Using existing binary{Color.NC}")
     
     # Start clients
-    alice_log = open(f'{test_dir}/alice.log', 'w')
-    bob_log = open(f'{test_dir}/bob.log', 'w')
-    charlie_log = open(f'{test_dir}/charlie.log', 'w')
-    dave_log = open(f'{test_dir}/dave.log', 'w')
-    
     print(f"{Color.CYAN}Starting Alice, Bob, Charlie, and Dave...{Color.NC}")
+    clients = [spawn_client(name, port, test_dir, binary_path)
+               for name, port in (('Alice', 9001), ('Bob', 9002), ('Charlie', 9003), ('Dave', 9004))]
+    alice, bob, charlie, dave = clients
+    members = [bob, charlie, dave]
     
-    alice = {
-        'name': 'Alice',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', f'{test_dir}/alice.key', '--port', '9001'],
-            stdin=subprocess.PIPE, stdout=alice_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': f'{test_dir}/alice.log'
-    }
-    
-    bob = {
-        'name': 'Bob',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', f'{test_dir}/bob.key', '--port', '9002'],
-            stdin=subprocess.PIPE, stdout=bob_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': f'{test_dir}/bob.log'
-    }
-    
-    charlie = {
-        'name': 'Charlie',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', f'{test_dir}/charlie.key', '--port', '9003'],
-            stdin=subprocess.PIPE, stdout=charlie_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': f'{test_dir}/charlie.log'
-    }
-    
-    dave = {
-        'name': 'Dave',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', f'{test_dir}/dave.key', '--port', '9004'],
-            stdin=subprocess.PIPE, stdout=dave_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': f'{test_dir}/dave.log'
-    }
-    
+    logs = []
     try:
+        for client in clients:
+            wait_for(client, LISTENING_RE, timeout=5)
         print(f"{Color.GREEN}✓ Alice, Bob, Charlie, and Dave started{Color.NC}\n")
-        time.sleep(3)
         
         # Setup
         print(f"{Color.CYAN}Setting up KeyPackages and Space...{Color.NC}")
-        run_command(alice, 'keypackage publish', wait=5)
-        run_command(bob, 'keypackage publish', wait=5)
-        run_command(charlie, 'keypackage publish', wait=5)
-        run_command(dave, 'keypackage publish', wait=5)
+        # Each client talks to its own process, so these run side by side
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda c: run_command(c, 'keypackage publish', expect=KP_PUBLISHED_RE),
+                          clients))
         
-        run_command(alice, 'space create kick-test', wait=3)
-        space_id = find_in_log(alice['log'], r'Created space: .+? \(([0-9a-f]{16})\)')
+        run_command(alice, 'space create kick-test', expect=SPACE_ID_RE)
+        space_id = find_in_log(alice, SPACE_ID_RE, 'space_id')
         if not space_id:
             print(f"{Color.RED}✗ Failed to create space{Color.NC}")
             return 1
         
-        run_command(alice, 'context', wait=2)
-        full_space_id = find_in_log(alice['log'], r'Space: ([0-9a-f]{64})')
+        run_command(alice, 'context', expect=FULL_SPACE_RE)
+        full_space_id = find_in_log(alice, FULL_SPACE_RE, 'full_space_id')
         
-        run_command(alice, 'invite create', wait=3)
-        invite = find_in_log(alice['log'], r'Created invite code: (\w+)')
+        run_command(alice, 'invite create', expect=INVITE_RE)
+        invite = find_in_log(alice, INVITE_RE, 'invite')
         
-        run_command(alice, 'network', wait=2)
-        peer_id = find_in_log(alice['log'], r'Peer ID: (\w+)')
+        run_command(alice, 'network', expect=PEER_RE)
+        peer_id = find_in_log(alice, PEER_RE, 'peer_id')
         
         print(f"{Color.GREEN}✓ Setup complete{Color.NC}\n")
         
-        # Bob joins
-        print(f"{Color.CYAN}Bob connecting and joining...{Color.NC}")
-        run_command(bob, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3)
-        run_command(bob, f'join {full_space_id} {invite}', wait=5)
+        # Bob, Charlie and Dave connect and join concurrently
+        print(f"{Color.CYAN}Bob, Charlie, and Dave connecting and joining...{Color.NC}")
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            bob_id, charlie_id, dave_id = pool.map(
+                lambda c: join_space(c, peer_id, full_space_id, invite), members)
         
-        run_command(bob, 'whoami', wait=2)
-        bob_id = find_in_log(bob['log'], r'User ID: ([0-9a-f]{64})')
-        
-        print(f"{Color.GREEN}✓ Bob joined{Color.NC}\n")
-        
-        # Charlie joins
-        print(f"{Color.CYAN}Charlie connecting and joining...{Color.NC}")
-        run_command(charlie, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3)
-        run_command(charlie, f'join {full_space_id} {invite}', wait=5)
-        
-        run_command(charlie, 'whoami', wait=2)
-        charlie_id = find_in_log(charlie['log'], r'User ID: ([0-9a-f]{64})')
-        
-        print(f"{Color.GREEN}✓ Charlie joined{Color.NC}\n")
-        
-        # Dave joins
-        print(f"{Color.CYAN}Dave connecting and joining...{Color.NC}")
-        run_command(dave, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3)
-        run_command(dave, f'join {full_space_id} {invite}', wait=8)
-        
-        run_command(dave, 'whoami', wait=3)
-        dave_id = find_in_log(dave['log'], r'User ID: ([0-9a-f]{64})')
-        
-        print(f"{Color.GREEN}✓ Dave joined{Color.NC}\n")
+        print(f"{Color.GREEN}✓ Bob, Charlie, and Dave joined{Color.NC}\n")
         
         # Add members to MLS
         print(f"{Color.CYAN}Adding Bob to MLS group...{Color.NC}")
-        run_command(alice, f'member add {bob_id}', wait=5)
-        time.sleep(4)
+        run_command(alice, f'member add {bob_id}', expect=MEMBER_ADDED_RE)
+        wait_for(bob, MLS_JOINED_RE, timeout=8)  # Wait for Welcome message
         print(f"{Color.GREEN}✓ Bob added to MLS{Color.NC}\n")
         
         print(f"{Color.CYAN}Adding Charlie to MLS group...{Color.NC}")
-        run_command(alice, f'member add {charlie_id}', wait=5)
-        time.sleep(4)
+        run_command(alice, f'member add {charlie_id}', expect=MEMBER_ADDED_RE)
+        wait_for(charlie, MLS_JOINED_RE, timeout=8)  # Wait for Welcome message
         print(f"{Color.GREEN}✓ Charlie added to MLS{Color.NC}\n")
         
         print(f"{Color.CYAN}Adding Dave to MLS group...{Color.NC}")
-        run_command(alice, f'member add {dave_id}', wait=5)
-        time.sleep(4)
+        run_command(alice, f'member add {dave_id}', expect=MEMBER_ADDED_RE)
+        wait_for(dave, MLS_JOINED_RE, timeout=8)  # Wait for Welcome message
         print(f"{Color.GREEN}✓ Dave added to MLS{Color.NC}\n")
         
         # Alice creates channel and sends message
         print(f"{Color.CYAN}Alice creating channel and sending message...{Color.NC}")
-        run_command(alice, 'channel create general', wait=3)
-        run_command(alice, 'thread create "Kick Test"', wait=3)
-        run_command(alice, 'send Message 1: Before kick', wait=4)
+        run_command(alice, 'channel create general', expect=CREATED_CHANNEL_RE)
+        run_command(alice, 'thread create "Kick Test"', expect=CREATED_THREAD_RE)
+        run_command(alice, 'send Message 1: Before kick', expect=SENT_RE)
         
-        print(f"{Color.YELLOW}⏳ Waiting for message propagation (5s)...{Color.NC}")
-        time.sleep(5)
+        print(f"{Color.YELLOW}⏳ Waiting for message propagation...{Color.NC}")
+        for client in members:
+            wait_for(client, BEFORE_KICK_RE, timeout=5)
         
         # All members navigate to thread
         print(f"\n{Color.CYAN}Bob, Charlie, and Dave navigating to thread...{Color.NC}")
-        for client in [bob, charlie, dave]:
-            run_command(client, f'space {space_id}', wait=2)
-            run_command(client, 'channels', wait=2)
+        shared = {}
+        for client in members:
+            run_command(client, f'space {space_id}', expect=SWITCHED_RE)
             
-            channel_id = find_in_log(client['log'], r'([0-9a-f]{16})\s+-\s+general')
+            channel_id = find_shared(client, shared, ('channel', space_id), 'channels', CHANNEL_RE)
             if channel_id:
-                run_command(client, f'channel {channel_id}', wait=2)
-                run_command(client, 'threads', wait=2)
-                thread_id = find_in_log(client['log'], r'([0-9a-f]{16})\s+-\s+"?Kick Test"?')
+                run_command(client, f'channel {channel_id}', expect=SWITCHED_RE)
+                thread_id = find_shared(client, shared, ('thread', space_id), 'threads', THREAD_RE)
                 if thread_id:
-                    run_command(client, f'thread {thread_id}', wait=2)
-        
-        # Members reply
-        print(f"\n{Color.CYAN}Bob replying...{Color.NC}")
-        run_command(bob, 'send Message 2: Bob reply before kick', wait=4)
-        
-        print(f"{Color.CYAN}Charlie replying...{Color.NC}")
-        run_command(charlie, 'send Message 3: Charlie reply before kick', wait=4)
+                    run_command(client, f'thread {thread_id}', expect=SWITCHED_RE)
         
-        print(f"{Color.CYAN}Dave replying...{Color.NC}")
-        run_command(dave, 'send Message 4: Dave reply before kick', wait=4)
+        # Members reply concurrently, then wait once for all three to reach Alice
+        print(f"\n{Color.CYAN}Bob, Charlie, and Dave replying...{Color.NC}")
+        start = log_size(alice)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            list(pool.map(lambda post: run_command(*post, expect=SENT_RE), [
+                (bob, 'send Message 2: Bob reply before kick'),
+                (charlie, 'send Message 3: Charlie reply before kick'),
+                (dave, 'send Message 4: Dave reply before kick'),
+            ]))
         
-        print(f"{Color.YELLOW}⏳ Waiting for replies (7s)...{Color.NC}")
-        time.sleep(7)
+        print(f"{Color.YELLOW}⏳ Waiting for replies...{Color.NC}")
+        wait_for_all(alice, REPLIES, timeout=15, start=start)
         
         # Kick Bob
         print(f"\n{Color.CYAN}{'='*50}{Color.NC}")
         print(f"{Color.CYAN}Alice kicking Bob from the space...{Color.NC}")
         print(f"{Color.CYAN}{'='*50}{Color.NC}\n")
-        run_command(alice, f'kick {bob_id}', wait=7)
+        run_command(alice, f'kick {bob_id}', expect=REMOVED_RE, timeout=14)
         
         print(f"{Color.GREEN}✓ Bob has been kicked{Color.NC}\n")
         
         # Alice sends message after kick
         print(f"{Color.CYAN}Alice sending message after kicking Bob...{Color.NC}")
-        run_command(alice, 'send Message 5: After kick - Bob should NOT see, Charlie and Dave SHOULD see', wait=4)
+        bob_start = log_size(bob)
+        run_command(alice, 'send Message 5: After kick - Bob should NOT see, Charlie and Dave SHOULD see', expect=SENT_RE)
         
-        print(f"{Color.YELLOW}⏳ Final propagation wait (10s)...{Color.NC}")
-        time.sleep(10)
-        
-        # Close logs
-        alice_log.close()
-        bob_log.close()
-        charlie_log.close()
-        dave_log.close()
+        # Charlie and Dave should get message 5. Bob has to react to it too
+        # (decrypt or reject), or sit out the full window, before the check
+        # that he can't read it means anything
+        print(f"{Color.YELLOW}⏳ Final propagation wait...{Color.NC}")
+        for client in [charlie, dave]:
+            wait_for(client, AFTER_KICK_RE, timeout=10)
+        wait_for(bob, REACTED_RE, timeout=10, start=bob_start)
         
         # Check results
         print(f"\n{Color.CYAN}{'='*50}{Color.NC}")
         print(f"{Color.CYAN}Results{Color.NC}")
         print(f"{Color.CYAN}{'='*50}{Color.NC}\n")
         
-        alice_log_content = open(alice['log']).read()
-        bob_log_content = open(bob['log']).read()
-        charlie_log_content = open(charlie['log']).read()
-        dave_log_content = open(dave['log']).read()
+        # One read-only mapping per log; everything below searches it in place
+        logs = [load_log(client['log']) for client in clients]
+        tallies = {client['name']: tally(log) for client, log in zip(clients, logs)}
+        
+        def got(client, needle):
+            return tallies[client['name']][needle] > 0
         
-        alice_decrypts = len(re.findall(r'Decrypted MLS message', alice_log_content))
-        bob_decrypts = len(re.findall(r'Decrypted MLS message', bob_log_content))
-        charlie_decrypts = len(re.findall(r'Decrypted MLS message', charlie_log_content))
-        dave_decrypts = len(re.findall(r'Decrypted MLS message', dave_log_content))
+        alice_decrypts, bob_decrypts, charlie_decrypts, dave_decrypts = (
+            sum(tallies[client['name']][line] for line in DECRYPTED) for client in clients)
         
-        bob_got_msg1 = 'Before kick' in bob_log_content
-        alice_got_msg2 = 'Bob reply before kick' in alice_log_content
-        alice_got_msg3 = 'Charlie reply before kick' in alice_log_content
-        alice_got_msg4 = 'Dave reply before kick' in alice_log_content
-        bob_got_msg5 = 'After kick' in bob_log_content
-        charlie_got_msg5 = 'After kick' in charlie_log_content
-        dave_got_msg5 = 'After kick' in dave_log_content
+        bob_got_msg1 = got(bob, b'Before kick')
+        alice_got_msg2 = got(alice, b'Bob reply before kick')
+        alice_got_msg3 = got(alice, b'Charlie reply before kick')
+        alice_got_msg4 = got(alice, b'Dave reply before kick')
+        bob_got_msg5 = got(bob, b'After kick')
+        charlie_got_msg5 = got(charlie, b'After kick')
+        dave_got_msg5 = got(dave, b'After kick')
         
         print(f"  Alice total decryptions: {alice_decrypts}")
         print(f"  Bob total decryptions: {bob_decrypts}")
@@ -319,7 +434,7 @@ def main():
         else:
             print(f"{Color.RED}✗{Color.NC} E2EE not working for all members before kick")
         
-        if 'Successfully removed user' in alice_log_content or 'MLS keys rotated' in alice_log_content:
+        if got(alice, b'Successfully removed user') or got(alice, b'MLS keys rotated'):
             print(f"{Color.GREEN}✓{Color.NC} Alice successfully kicked Bob (MLS keys rotated)")
             tests_passed += 1
         else:
@@ -366,20 +481,23 @@ def main():
             return 1
             
     finally:
-        alice['proc'].terminate()
-        bob['proc'].terminate()
-        charlie['proc'].terminate()
-        dave['proc'].terminate()
-        try:
-            alice['proc'].wait(timeout=3)
-            bob['proc'].wait(timeout=3)
-            charlie['proc'].wait(timeout=3)
-            dave['proc'].wait(timeout=3)
-        except:
-            alice['proc'].kill()
-            bob['proc'].kill()
-            charlie['proc'].kill()
-            dave['proc'].kill()
+        for log in logs:
+            if isinstance(log, mmap.mmap):
+                log.close()
+        # Signal everyone first, then give them one shared grace period
+        for client in clients:
+            client['proc'].terminate()
+        deadline = time.monotonic() + 3
+        for client in clients:
+            try:
+                client['proc'].wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                client['proc'].kill()
+                client['proc'].wait()
+        # The children hold their own copies of these; closing ours on every
+        # exit path, early returns included, keeps the handles from leaking
+        for client in clients:
+            client['log_fh'].close()
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -10,57 +10,36 @@ Tests:
 - Test custom roles
 """
 
-import subprocess
 import time
 import re
-import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-class Color:
-    GREEN = '\033[0;32m'
-    RED = '\033[0;31m'
-    CYAN = '\033[0;36m'
-    YELLOW = '\033[1;33m'
-    PURPLE = '\033[0;35m'
-    NC = '\033[0m'
+from _framework import (
+    Color, _FAILED, RE_READY, RE_PUBLISHED, RE_SPACE_ID, ClientCrashed, captured,
+    log_tail, reset_test_dir, build_binary, spawn_client, stop_clients,
+    wait_for_log, run_command, scan_incremental, count_decrypts, check_log
+)
 
-def run_command(client, cmd, wait=2):
-    """Send command to client"""
-    print(f"{Color.CYAN}[{client['name']}]{Color.NC} {cmd}")
-    try:
-        client['proc'].stdin.write(cmd + '\n')
-        client['proc'].stdin.flush()
-        time.sleep(wait)
-    except BrokenPipeError:
-        print(f"{Color.RED}⚠️  [{client['name']}] Broken pipe - client may have crashed{Color.NC}")
-    except Exception as e:
-        print(f"{Color.RED}⚠️  [{client['name']}] Error sending command: {e}{Color.NC}")
-
-def find_in_log(log_file, pattern):
-    """Find pattern in log file"""
-    try:
-        with open(log_file, 'r') as f:
-            content = f.read()
-            match = re.search(pattern, content)
-            return match.group(1) if match else None
-    except:
-        return None
-
-def check_log(log_file, pattern, context_lines=0):
-    """Check if pattern exists in log and optionally return context"""
-    try:
-        with open(log_file, 'r') as f:
-            content = f.read()
-            if context_lines > 0:
-                lines = content.split('\n')
-                for i, line in enumerate(lines):
-                    if re.search(pattern, line):
-                        start = max(0, i - context_lines)
-                        end = min(len(lines), i + context_lines + 1)
-                        return True, '\n'.join(lines[start:end])
-            return bool(re.search(pattern, content)), None
-    except:
-        return False, None
+# Patterns specific to this scenario; the shared ones come from _framework
+RE_FULL_SPACE = re.compile(rb'Space: ([0-9a-f]{64})')
+RE_INVITE = re.compile(rb'Created invite code: (\w+)')
+RE_PEER_ID = re.compile(rb'Peer ID: (\w+)')
+RE_CONNECTED = re.compile(rb'Connected to peer!|' + _FAILED)
+RE_JOINED = re.compile(rb'Successfully joined Space!|' + _FAILED)
+RE_USER_ID = re.compile(rb'User ID: ([0-9a-f]{64})')
+RE_SPACE_SWITCHED = re.compile(rb'Switched to space: |' + _FAILED)
+RE_MEMBER_ADDED = re.compile(rb'added to MLS group!|Failed to add member')
+RE_MLS_JOINED = re.compile(rb'Successfully joined MLS group')
+RE_CHANNEL_DONE = re.compile(rb'Created channel: |' + _FAILED)
+RE_CHANNEL_CREATED = re.compile(rb'(Created channel|Channel.*created)')
+RE_DENIED = re.compile(rb'(permission|Permission|denied|Denied|not allowed|cannot)')
+RE_CREATED_CHANNEL = re.compile(rb'Created channel')
+RE_INVITE_DONE = re.compile(rb'Created invite code: (\w+)|' + _FAILED)
+RE_CHANNEL_SWITCHED = re.compile(rb'Switched to channel: |' + _FAILED)
+RE_THREAD_DONE = re.compile(rb'Created thread: |' + _FAILED)
+RE_SENT = re.compile(rb'Message sent \(|' + _FAILED)
+RE_DECRYPTED = re.compile(rb'Decrypted (?:Space MLS|Channel MLS|queued) message')
 
 def print_test(name):
     """Print test header"""
@@ -83,71 +62,27 @@ def main():
     
     # Setup test directory structure
     test_dir = 'tests/test-runs/permissions'
-    os.makedirs(test_dir, exist_ok=True)
+    reset_test_dir(test_dir)
     
-    # Cleanup old test artifacts
-    os.system(f'rm -rf {test_dir}/* 2>/dev/null')
-    
-    # Build (use debug build)
-    binary_path = './target/debug/spaceway'
-    
-    # Check if binary exists
-    if not os.path.exists(binary_path):
-        print(f"{Color.CYAN}Building debug version...{Color.NC}")
-        build_result = subprocess.run(
-            ['cargo', '+nightly', 'build'],
-            capture_output=True,
-            text=True
-        )
-        
-        if build_result.returncode != 0:
-            print(f"{Color.RED}Build failed!{Color.NC}")
-            print(build_result.stderr[-500:] if len(build_result.stderr) > 500 else build_result.stderr)
-            return 1
-        
-        print(f"{Color.GREEN}✓ Build completed{Color.NC}")
-    else:
-        print(f"{Color.GREEN}✓ Using existing binary{Color.NC}")
+    if not build_binary():
+        return 1
     
     # Start clients
-    alice_log = open(f'{test_dir}/alice.log', 'w')
-    bob_log = open(f'{test_dir}/bob.log', 'w')
-    charlie_log = open(f'{test_dir}/charlie.log', 'w')
-    
     print(f"{Color.CYAN}Starting Alice, Bob, and Charlie...{Color.NC}")
     
-    alice = {
-        'name': 'Alice',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', f'{test_dir}/alice.key', '--port', '9001'],
-            stdin=subprocess.PIPE, stdout=alice_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': f'{test_dir}/alice.log'
-    }
-    
-    bob = {
-        'name': 'Bob',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', f'{test_dir}/bob.key', '--port', '9002'],
-            stdin=subprocess.PIPE, stdout=bob_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': f'{test_dir}/bob.log'
-    }
-    
-    charlie = {
-        'name': 'Charlie',
-        'proc': subprocess.Popen(
-            [binary_path, '--account', f'{test_dir}/charlie.key', '--port', '9003'],
-            stdin=subprocess.PIPE, stdout=charlie_log, stderr=subprocess.STDOUT, text=True, bufsize=1
-        ),
-        'log': f'{test_dir}/charlie.log'
-    }
+    alice = spawn_client('Alice', 9001, test_dir)
+    bob = spawn_client('Bob', 9002, test_dir)
+    charlie = spawn_client('Charlie', 9003, test_dir)
     
     test_results = []
     
     try:
+        # The CLI prints this banner right before it starts reading piped commands;
+        # all three start up at once, so wait on them together
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            list(pool.map(lambda c: wait_for_log(c, RE_READY, timeout=10),
+                          [alice, bob, charlie]))
         print(f"{Color.GREEN}✓ All clients started{Color.NC}\n")
-        time.sleep(3)
         
         # ============================================================
         # SETUP PHASE
@@ -155,63 +90,67 @@ def main():
         print_test("SETUP - Create Space and Add Members")
         
         print(f"{Color.CYAN}Publishing KeyPackages...{Color.NC}")
-        run_command(alice, 'keypackage publish', wait=5)
-        run_command(bob, 'keypackage publish', wait=5)
-        run_command(charlie, 'keypackage publish', wait=5)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            list(pool.map(lambda c: run_command(c, 'keypackage publish', expect=RE_PUBLISHED),
+                          [alice, bob, charlie]))
         
         print(f"{Color.CYAN}Alice creating space 'permission-test'...{Color.NC}")
-        run_command(alice, 'space create permission-test', wait=3)
-        space_id = find_in_log(alice['log'], r'Created space: .+? \(([0-9a-f]{16})\)')
+        match = run_command(alice, 'space create permission-test', expect=RE_SPACE_ID)
+        space_id = captured(match)
         if not space_id:
             print(f"{Color.RED}✗ Failed to create space{Color.NC}")
             return 1
         
-        run_command(alice, 'context', wait=2)
-        full_space_id = find_in_log(alice['log'], r'Space: ([0-9a-f]{64})')
+        match = run_command(alice, 'context', expect=RE_FULL_SPACE)
+        full_space_id = captured(match)
         
-        run_command(alice, 'invite create', wait=3)
-        invite = find_in_log(alice['log'], r'Created invite code: (\w+)')
+        match = run_command(alice, 'invite create', expect=RE_INVITE)
+        invite = captured(match)
         
-        run_command(alice, 'network', wait=2)
-        peer_id = find_in_log(alice['log'], r'Peer ID: (\w+)')
+        match = run_command(alice, 'network', expect=RE_PEER_ID)
+        peer_id = captured(match)
         
         print(f"{Color.GREEN}✓ Space created: {space_id}{Color.NC}")
         print(f"{Color.GREEN}✓ Invite code: {invite}{Color.NC}\n")
         
+        # Bob and Charlie connect to Alice at the same time
+        print(f"{Color.CYAN}Bob and Charlie connecting...{Color.NC}")
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(lambda c: run_command(c, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', expect=RE_CONNECTED),
+                          [bob, charlie]))
+        
         # Bob joins
-        print(f"{Color.CYAN}Bob connecting and joining...{Color.NC}")
-        run_command(bob, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3)
-        run_command(bob, f'join {full_space_id} {invite}', wait=5)
+        print(f"{Color.CYAN}Bob joining...{Color.NC}")
+        run_command(bob, f'join {full_space_id} {invite}', expect=RE_JOINED)
         
-        run_command(bob, 'whoami', wait=2)
-        bob_id = find_in_log(bob['log'], r'User ID: ([0-9a-f]{64})')
+        match = run_command(bob, 'whoami', expect=RE_USER_ID)
+        bob_id = captured(match)
         
-        # Select the space for Bob
-        run_command(bob, f'space {space_id}', wait=3)  # Increased wait time for space sync
+        # Select the space for Bob, waiting for it to have synced
+        run_command(bob, f'space {space_id}', expect=RE_SPACE_SWITCHED)
         
         print(f"{Color.GREEN}✓ Bob joined{Color.NC}")
         print(f"{Color.GREEN}  Bob ID: {bob_id[:16]}...{Color.NC}\n")
         
         # Charlie joins
-        print(f"{Color.CYAN}Charlie connecting and joining...{Color.NC}")
-        run_command(charlie, f'connect /ip4/127.0.0.1/tcp/9001/p2p/{peer_id}', wait=3)
-        run_command(charlie, f'join {full_space_id} {invite}', wait=5)
+        print(f"{Color.CYAN}Charlie joining...{Color.NC}")
+        run_command(charlie, f'join {full_space_id} {invite}', expect=RE_JOINED)
         
-        run_command(charlie, 'whoami', wait=2)
-        charlie_id = find_in_log(charlie['log'], r'User ID: ([0-9a-f]{64})')
+        match = run_command(charlie, 'whoami', expect=RE_USER_ID)
+        charlie_id = captured(match)
         
-        # Select the space for Charlie
-        run_command(charlie, f'space {space_id}', wait=3)  # Increased wait time for space sync
+        # Select the space for Charlie, waiting for it to have synced
+        run_command(charlie, f'space {space_id}', expect=RE_SPACE_SWITCHED)
         
         print(f"{Color.GREEN}✓ Charlie joined{Color.NC}")
         print(f"{Color.GREEN}  Charlie ID: {charlie_id[:16]}...{Color.NC}\n")
         
         # Add to MLS
         print(f"{Color.CYAN}Adding Bob and Charlie to MLS group...{Color.NC}")
-        run_command(alice, f'member add {bob_id}', wait=5)
-        time.sleep(10)
-        run_command(alice, f'member add {charlie_id}', wait=5)
-        time.sleep(8)
+        run_command(alice, f'member add {bob_id}', expect=RE_MEMBER_ADDED)
+        wait_for_log(bob, RE_MLS_JOINED, timeout=15)  # Wait for Welcome message
+        run_command(alice, f'member add {charlie_id}', expect=RE_MEMBER_ADDED)
+        wait_for_log(charlie, RE_MLS_JOINED, timeout=13)
         
         print(f"{Color.GREEN}✓ All members in MLS group{Color.NC}\n")
         
@@ -227,12 +166,9 @@ def main():
         print_test("TEST 1 - Owner Has All Permissions")
         
         print(f"{Color.CYAN}Alice creating channel (should succeed)...{Color.NC}")
-        run_command(alice, 'channel create general', wait=3)
+        run_command(alice, 'channel create general', expect=RE_CHANNEL_DONE)
         
-        alice_log.close()
-        alice_log = open(alice['log'], 'r')
-        
-        has_permission, _ = check_log(alice['log'], r'(Created channel|Channel.*created)')
+        has_permission = bool(scan_incremental(alice, RE_CHANNEL_CREATED))
         print_result("Alice can create channels", has_permission)
         test_results.append(("Owner creates channel", has_permission))
         
@@ -254,20 +190,17 @@ def main():
         print_test("TEST 3 - Member (Charlie) Has Limited Permissions")
         
         print(f"{Color.CYAN}Charlie attempting to create channel (should fail)...{Color.NC}")
-        run_command(charlie, 'channel create charlies-channel', wait=3)
-        
-        charlie_log.close()
-        charlie_log = open(charlie['log'], 'r')
+        run_command(charlie, 'channel create charlies-channel', expect=RE_CHANNEL_DONE, timeout=3)
         
         # Check if Charlie got permission denied
-        denied, context = check_log(charlie['log'], r'(permission|Permission|denied|Denied|not allowed|cannot)', context_lines=2)
+        denied, context = check_log(charlie, RE_DENIED, context_lines=2)
         
         if denied:
             print_result("Charlie cannot create channels", True, "Permission denied as expected")
             test_results.append(("Member blocked from creating channels", True))
         else:
             # If no explicit denial, check if channel was created
-            created, _ = check_log(charlie['log'], r'Created channel')
+            created, _ = check_log(charlie, RE_CREATED_CHANNEL)
             if created:
                 print_result("Charlie cannot create channels", False, "ERROR: Charlie created channel")
                 test_results.append(("Member blocked from creating channels", False))
@@ -281,13 +214,9 @@ def main():
         print_test("TEST 4 - Member (Charlie) Can Create Invites")
         
         print(f"{Color.YELLOW}ℹ  Members have INVITE_MEMBERS permission by default{Color.NC}")
-        print(f"{Color.CYAN}Waiting for Charlie to sync space state...{Color.NC}")
-        time.sleep(5)  # Give Charlie time to fully sync
-        
         print(f"{Color.CYAN}Charlie creating invite (should succeed - Members can invite)...{Color.NC}")
-        run_command(charlie, 'invite create', wait=5)  # Increased wait time
-        
-        charlie_invite = find_in_log(charlie['log'], r'Created invite code: (\w+)')
+        match = run_command(charlie, 'invite create', expect=RE_INVITE_DONE)
+        charlie_invite = captured(match)
         has_invite_perm = charlie_invite is not None
         
         if has_invite_perm:
@@ -336,33 +265,24 @@ def main():
         print_test("TEST 7 - Basic Messaging Works")
         
         print(f"{Color.CYAN}Alice switching to general channel...{Color.NC}")
-        run_command(alice, 'channel general', wait=3)
-        
-        print(f"{Color.CYAN}Waiting for channel to be fully ready...{Color.NC}")
-        time.sleep(3)
+        run_command(alice, 'channel general', expect=RE_CHANNEL_SWITCHED)
         
         print(f"{Color.CYAN}Alice creating thread...{Color.NC}")
-        run_command(alice, 'thread create "Permission Test"', wait=4)
+        run_command(alice, 'thread create "Permission Test"', expect=RE_THREAD_DONE)
         
         print(f"{Color.CYAN}Alice posting message...{Color.NC}")
-        run_command(alice, 'send Hello Bob and Charlie! Testing permissions.', wait=5)
-        
-        print(f"{Color.YELLOW}⏳ Waiting for message propagation (15s)...{Color.NC}")
-        time.sleep(15)  # Increased wait time for message delivery
+        run_command(alice, 'send Hello Bob and Charlie! Testing permissions.', expect=RE_SENT)
         
-        # Close logs for reading
-        alice_log.close()
-        bob_log.close()
-        charlie_log.close()
+        print(f"{Color.YELLOW}⏳ Waiting for message propagation...{Color.NC}")
+        deadline = time.monotonic() + 15
+        for client in [bob, charlie]:
+            wait_for_log(client, RE_DECRYPTED, timeout=max(0, deadline - time.monotonic()))
         
-        # Check message delivery
-        alice_content = open(alice['log']).read()
-        bob_content = open(bob['log']).read()
-        charlie_content = open(charlie['log']).read()
-        
-        alice_decrypts = len(re.findall(r'Decrypted MLS message', alice_content))
-        bob_decrypts = len(re.findall(r'Decrypted MLS message', bob_content))
-        charlie_decrypts = len(re.findall(r'Decrypted MLS message', charlie_content))
+        # Check message delivery, topping up the running counts with any late arrivals;
+        # the three logs are independent files, so read them concurrently
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            alice_decrypts, bob_decrypts, charlie_decrypts = pool.map(count_decrypts,
+                                                                      [alice, bob, charlie])
         
         print(f"{Color.GREEN}✓ Alice decrypted: {alice_decrypts} messages{Color.NC}")
         print(f"{Color.GREEN}✓ Bob decrypted: {bob_decrypts} messages{Color.NC}")
@@ -408,14 +328,15 @@ def main():
         print(f"  Bob:     {bob['log']}")
         print(f"  Charlie: {charlie['log']}")
         
-        print(f"\n{Color.CYAN}Waiting for clients to finish processing...{Color.NC}")
-        time.sleep(3)  # Give clients time to finish processing commands
-        
         return return_code
         
     except KeyboardInterrupt:
         print(f"\n{Color.YELLOW}Test interrupted{Color.NC}")
         return 1
+    except ClientCrashed as e:
+        print(f"\n{Color.RED}✗ {e}; end of its log:{Color.NC}")
+        print(log_tail(e.client))
+        return 1
     except Exception as e:
         print(f"\n{Color.RED}Error: {e}{Color.NC}")
         import traceback
@@ -424,23 +345,7 @@ def main():
     finally:
         # Cleanup
         print(f"\n{Color.CYAN}Cleaning up...{Color.NC}")
-        for client in [alice, bob, charlie]:
-            try:
-                client['proc'].terminate()
-                client['proc'].wait(timeout=2)
-            except:
-                try:
-                    client['proc'].kill()
-                except:
-                    pass
-        
-        # Close log files if still open
-        try:
-            alice_log.close()
-            bob_log.close()
-            charlie_log.close()
-        except:
-            pass
+        stop_clients([alice, bob, charlie])
 
 if __name__ == '__main__':
     sys.exit(main())